@@ -1,41 +1,27 @@
 # https://airtable.com/create/tokens
-
+"""Fetch UN entity metadata from Airtable into public/data/entities.json.
+
+By default every record is fetched. With --sync, only the selected columns of
+records modified since the last sync are fetched. They are merged into a local
+snapshot, and entities.json is rewritten only if its content changes. Set
+AIRTABLE_ENDPOINT_URL to run against a local stub (see airtable_stub.py).
+"""
+import argparse
+import json
 import os
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import pandas as pd
-from pyairtable import Api
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-api = Api(os.environ["AIRTABLE_API_KEY"])
-
-BASE_ID = os.environ["AIRTABLE_BASE_ID"]
-TABLE_ID = os.environ["AIRTABLE_TABLE_ID"]
-
-table = api.table(BASE_ID, TABLE_ID)
-records = table.all(view="API ALL")
-
-if records:
-    data = [record["fields"] for record in records]
-    df = pd.DataFrame(data)
-    
-    
-# Check for duplicate entities
-duplicates = df[df["entity"].duplicated(keep=False)]["entity"]
-if not duplicates.empty:
-    print("Warning: Duplicate entities found in the input data:")
-    print(duplicates.to_list())
-else:
-    print("All entities are unique.")
-
-# df.shape[1]
-# df.shape[0]
-# df.columns
+
+OUT = Path("public/data/entities.json")
+SNAPSHOT = Path("data/airtable/entities_snapshot.json")
+VIEW = "API ALL"
+# Re-fetch records modified shortly before the cursor to tolerate clock skew
+CURSOR_OVERLAP = timedelta(minutes=5)
+
 # List of selected columns
-selected_columns = [
+SELECTED_COLUMNS = [
     "entity",
     "entity_long",
     "entity_combined",
@@ -74,21 +60,83 @@ selected_columns = [
 
 # TODO: don't forget to also add in `entity.ts`
 
-# Compare with all available columns
-all_columns = df.columns.tolist()
-not_selected_columns = [col for col in all_columns if col not in selected_columns]
-
-# Print columns that are not selected
-print("Columns not selected:", not_selected_columns)
-
-# Filter the DataFrame to include only selected columns
-df = df[selected_columns]
-
-# Filter out rows where the entity column matches "Other"
-df = df[df["entity"] != "Other"]
-
-# Filter out rows where the on_display column is False
-df = df[df["on_display"] != False]
-
-df.to_json("public/data/entities.json", orient="records", indent=2)
-
+def get_table():
+    from dotenv import load_dotenv
+    from pyairtable import Api
+    # Load environment variables from .env file
+    load_dotenv()
+    endpoint = os.environ.get("AIRTABLE_ENDPOINT_URL")
+    api = Api(os.environ["AIRTABLE_API_KEY"], **({"endpoint_url": endpoint} if endpoint else {}))
+    return api.table(os.environ["AIRTABLE_BASE_ID"], os.environ["AIRTABLE_TABLE_ID"])
+
+def fetch_all(table) -> list[dict]:
+    return [record["fields"] for record in table.all(view=VIEW)]
+
+def sync(table) -> list[dict]:
+    """Merge records modified since the stored cursor into the snapshot; returns rows in view order."""
+    snapshot = json.loads(SNAPSHOT.read_text()) if SNAPSHOT.exists() else {"cursor": None, "records": {}}
+    started = datetime.now(timezone.utc)
+    records = snapshot["records"]
+
+    formula = None
+    if snapshot["cursor"]:
+        since = (datetime.fromisoformat(snapshot["cursor"]) - CURSOR_OVERLAP).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        formula = f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{since}'))"
+    changed = table.all(view=VIEW, fields=SELECTED_COLUMNS, formula=formula)
+    records.update({r["id"]: r["fields"] for r in changed})
+
+    # Record ids in view order: drops deleted/hidden records and catches any the cursor missed
+    order = [r["id"] for r in table.all(view=VIEW, fields=["entity"])]
+    missing = [rid for rid in order if rid not in records]
+    if missing:
+        ids = ", ".join(f"RECORD_ID()='{rid}'" for rid in missing)
+        records.update({r["id"]: r["fields"] for r in table.all(fields=SELECTED_COLUMNS, formula=f"OR({ids})")})
+    records = {rid: records[rid] for rid in order if rid in records}
+
+    SNAPSHOT.parent.mkdir(parents=True, exist_ok=True)
+    SNAPSHOT.write_text(json.dumps({"cursor": started.isoformat(), "records": records}, indent=2, ensure_ascii=False))
+    print(f"Synced {len(changed)} changed and {len(missing)} missing records, {len(records)} in snapshot")
+    return list(records.values())
+
+def write_entities(rows: list[dict]) -> bool:
+    """Write entities.json from Airtable rows; returns False if the content is unchanged."""
+    df = pd.DataFrame(rows)
+
+    # Check for duplicate entities
+    duplicates = df[df["entity"].duplicated(keep=False)]["entity"]
+    if not duplicates.empty:
+        print("Warning: Duplicate entities found in the input data:")
+        print(duplicates.to_list())
+    else:
+        print("All entities are unique.")
+
+    # Compare with all available columns
+    not_selected_columns = [col for col in df.columns if col not in SELECTED_COLUMNS]
+
+    # Print columns that are not selected
+    print("Columns not selected:", not_selected_columns)
+
+    # Filter the DataFrame to include only selected columns
+    df = df.reindex(columns=SELECTED_COLUMNS)
+
+    # Filter out rows where the entity column matches "Other"
+    df = df[df["entity"] != "Other"]
+
+    # Filter out rows where the on_display column is False
+    df = df[df["on_display"] != False]
+
+    content = df.to_json(orient="records", indent=2)
+    if OUT.exists() and OUT.read_text() == content:
+        print(f"{OUT} unchanged")
+        return False
+    OUT.write_text(content)
+    print(f"Wrote {OUT}: {len(df)} entities")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sync", action="store_true", help="incremental sync via the local snapshot")
+    args = parser.parse_args()
+
+    table = get_table()
+    write_entities(sync(table) if args.sync else fetch_all(table))
@@ -1,13 +1,11 @@
-import requests
+import argparse
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
+from utils import aggregate_ceb_csv, read_ceb_csv
 
 ceb = Path("data/ceb")
 raw = ceb / "raw"
-raw.mkdir(parents=True, exist_ok=True)
 clean = ceb / "clean"
-clean.mkdir(parents=True, exist_ok=True)
 
 current_year = datetime.now().year
 first_expected_year = 2021 # some files start from 2011 already but some only 2021
@@ -27,36 +25,40 @@ ceb_files = [
 ]
 
 def fetch_files():
+    import requests
+    raw.mkdir(parents=True, exist_ok=True)
     url = "https://unsceb.org/sites/default/files/statistic_files/Financial/"
     for file in ceb_files:
         f = requests.get(url + file)
         with open(raw / file, "wb") as outfile:
             outfile.write(f.content)
 
-def clean_and_validate():
-    dfs = {fn: pd.read_csv(raw / fn) for fn in ceb_files}
-    for fn in dfs:
-        dfs[fn].rename(columns=lambda x: x.strip().lower().replace(" ", "_").replace("usd_amount", "amount"), inplace=True)
-        dfs[fn]["calendar_year"] = dfs[fn]["calendar_year"].astype(int)
-        dfs[fn]["amount"] = pd.to_numeric(dfs[fn]["amount"], errors="coerce").fillna(0.0)
-        _years = dfs[fn]["calendar_year"].unique()
-        assert first_expected_year in _years, f"Missing data for {first_expected_year} in {fn}"
-        assert last_expected_year in _years, f"Missing data for {last_expected_year} in {fn}"
-    for year in years:
-        revenues = []
-        for fn, df in dfs.items():
-            if fn in ["revenue.csv", "revenue_sub_agency.csv", "revenue_contrib_type.csv"]:
-                revenue = df[df["calendar_year"] == year]["amount"].sum()
-                assert revenue > 0, f"No revenue data for year {year}"
-                revenues.append(int(round(revenue, -5)))
-        print(revenues)
-        # check that all revenue totals are consistent across files
-        assert all(r == revenues[0] for r in revenues), f"Revenue totals mismatch for year {year}: {revenues}"
+def read(path: Path, chunksize: int | None = None):
+    """Whole file, or with `chunksize` streamed and summed per key in bounded memory."""
+    return read_ceb_csv(path) if chunksize is None else aggregate_ceb_csv(path, chunksize)
+
+def clean_and_validate(chunksize: int | None = None):
+    from joblib import Parallel, delayed
+    from checks import run_checks, year_coverage, totals_consistent
+    clean.mkdir(parents=True, exist_ok=True)
+    # Read all files concurrently with their declared schemas (see CEB_SCHEMAS in utils)
+    frames = Parallel(n_jobs=len(ceb_files), prefer="threads")(delayed(read)(raw / fn, chunksize) for fn in ceb_files)
+    dfs = dict(zip(ceb_files, frames))
+    report = run_checks(dfs, [
+        *(year_coverage(fn, years, col="calendar_year") for fn in ceb_files),
+        # revenue totals must agree across files (to 100k USD) and be positive
+        totals_consistent(["revenue.csv", "revenue_sub_agency.csv", "revenue_contrib_type.csv"], by="calendar_year", groups=years),
+    ])
+    report.print()
+    report.raise_on_error()
     for fn, df in dfs.items():
         df.to_csv(clean / fn, index=False)
 
-
+def run(chunksize: int | None = None):
+    # fetch_files()
+    clean_and_validate(chunksize)
 
 if __name__ == "__main__":
-    # fetch_files()
-    clean_and_validate()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunksize", type=int, help="stream raw files in chunks of this many rows, summing amounts per key")
+    run(parser.parse_args().chunksize)
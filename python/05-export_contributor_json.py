@@ -1,103 +1,153 @@
-"""Export contributor data to JSON for frontend consumption."""
+"""Export contributor data to JSON for frontend consumption.
+
+Revenue is read from the store (store.py) once, in the parent process and in the
+fused file's row order; per-year slices of it are handed to the workers, which never
+touch the store.
+"""
+import argparse
 import json
 import pandas as pd
 from pathlib import Path
 from collections import defaultdict
-from utils import normalize_entity
+from store import query
+from utils import TRENDS_FORMATS, decode_trends, encode_trends, parse_years, rev_category, select_years, trends_path
 
-YEARS = list(range(2013, 2025))
+# First year exported; the last is the latest year with revenue in the store
+FIRST_YEAR = 2013
 OUT = Path("public/data")
+METRICS = ["assessed", "voluntary_earmarked", "voluntary_unearmarked", "total"]
+
+def revenue_rows() -> pd.DataFrame:
+    """Fused revenue rows in file order, with their display category."""
+    df = query("SELECT * FROM revenue ORDER BY rowid")
+    df["is_other"] = df["is_other"].astype(bool)
+    df["rev_cat"] = df["rev_type"].map(rev_category)
+    return df
 
-# R-code to display category mapping
-REV_CATEGORY = {
-    "R01": "Assessed", "R02A": "Voluntary un-earmarked", "R02B": "Voluntary un-earmarked",
-    "R03A": "Voluntary earmarked", "R03B": "Voluntary earmarked", "R03C": "Voluntary earmarked",
-    "R03D": "Voluntary earmarked", "R03E": "Voluntary earmarked", "R03F": "Voluntary earmarked",
-    "R04A": "Other", "R04B": "Other", "R04C": "Other", "R05": "Other",
-    "R07": "Voluntary earmarked", "R08": "Voluntary un-earmarked", "R08B": "Voluntary un-earmarked",
-    "R09": "Voluntary earmarked", "R10": "Voluntary earmarked", "R11": "Voluntary earmarked", "R12": "Voluntary earmarked",
-}
-
-def rev_category(code: str) -> str:
-    return REV_CATEGORY.get(code, "Voluntary earmarked")
-
-def load_data():
-    fused = pd.read_csv("data/ceb/fused/revenue_by_contributor.csv")
-    fused["entity"] = fused["entity"].apply(normalize_entity)
-    fused["rev_cat"] = fused["rev_type"].apply(rev_category)
-    
-    states = pd.read_csv("data/ceb/member_states.csv")
+def load_states() -> dict:
+    """Member state info by country."""
+    states = query("SELECT * FROM member_states")
     state_info = {row["country"]: {"status": row["status"],
                                     "payment_status": row["payment_status"] if pd.notna(row["payment_status"]) else None,
                                     "payment_date": row["payment_date"] if pd.notna(row["payment_date"]) else None}
                   for _, row in states.iterrows()}
-    return fused, state_info
+    return state_info
 
-def export_donors_json(df: pd.DataFrame, state_info: dict):
-    """Generate donors-{year}.json with contributions by donor."""
-    for year in YEARS:
-        ydf = df[df["year"] == year]
-        donors = defaultdict(lambda: {"status": "organization", "category": "Non-Government", "contributions": {}})
-        
-        for _, row in ydf.iterrows():
-            d = row["donor_name"]
-            
-            # Set category from donor_type
-            donors[d]["category"] = row["donor_type"]
-            
-            # Mark aggregated "Other X" entries (no sidebar view)
-            if row["is_other"]:
-                donors[d]["is_other"] = True
-            
-            # Set status for government donors
-            if row["donor_type"] == "Government":
-                if d in state_info:
-                    donors[d]["status"] = state_info[d]["status"]
-                    if year == max(YEARS) and state_info[d].get("payment_status"):
-                        donors[d]["payment_status"] = state_info[d]["payment_status"]
-                        donors[d]["payment_date"] = state_info[d]["payment_date"]
-                else:
-                    donors[d]["status"] = "nonmember"
-            
-            e, cat, amt = row["entity"], row["rev_cat"], row["amount"]
-            donors[d]["contributions"].setdefault(e, {})[cat] = donors[d]["contributions"].get(e, {}).get(cat, 0) + amt
-        
-        with open(OUT / f"donors-{year}.json", "w") as f:
-            json.dump(dict(donors), f, indent=2)
-        print(f"donors-{year}.json: {len(donors)} donors")
-
-def export_entity_revenue_json(df: pd.DataFrame):
-    """Generate entity-revenue-{year}.json with revenue by entity."""
-    for year in YEARS:
-        ydf = df[df["year"] == year]
-        entities = {}
-        
-        for entity in ydf["entity"].unique():
-            edf = ydf[ydf["entity"] == entity]
-            by_type = edf.groupby("rev_cat")["amount"].sum().to_dict()
-            
-            # Aggregate by donor (excluding "Other X" entries)
-            specific = edf[~edf["is_other"]]
-            donor_totals = defaultdict(lambda: {"donor": "", "total": 0})
-            for _, row in specific.iterrows():
-                d, cat, amt = row["donor_name"], row["rev_cat"], row["amount"]
-                donor_totals[d]["donor"] = d
-                donor_totals[d]["total"] += amt
-                donor_totals[d][cat] = donor_totals[d].get(cat, 0) + amt
-            
-            entities[entity] = {
-                "total": edf["amount"].sum(),
-                "year": year,
-                "by_type": by_type,
-                "by_donor": sorted(donor_totals.values(), key=lambda x: -x["total"])
-            }
-        
-        with open(OUT / f"entity-revenue-{year}.json", "w") as f:
-            json.dump(entities, f, indent=2)
-        print(f"entity-revenue-{year}.json: {len(entities)} entities, ${sum(e['total'] for e in entities.values())/1e9:.1f}B")
+def revenue_years(df: pd.DataFrame) -> list[int]:
+    """FIRST_YEAR through the latest year in the revenue rows."""
+    return list(range(FIRST_YEAR, int(df["year"].max()) + 1)) if len(df) else []
+
+def year_slices(df: pd.DataFrame, years: list[int]) -> list[tuple[int, pd.DataFrame]]:
+    """(year, rows) for each of `years`, split in one pass; years without rows get an empty frame."""
+    slices = dict(tuple(df[df["year"].isin(years)].groupby("year", sort=False)))
+    return [(year, slices.get(year, df.iloc[:0])) for year in years]
+
+def donors_year(year: int, ydf: pd.DataFrame, state_info: dict, out: Path, latest: bool = False) -> str:
+    """Write donors-{year}.json from that year's revenue (with payment status if it is the
+    `latest` year); returns its summary line."""
+    donors = defaultdict(lambda: {"status": "organization", "category": "Non-Government", "contributions": {}})
+    
+    for row in ydf.to_dict(orient="records"):
+        d = row["donor_name"]
+    
+        # Set category from donor_type
+        donors[d]["category"] = row["donor_type"]
+    
+        # Mark aggregated "Other X" entries (no sidebar view)
+        if row["is_other"]:
+            donors[d]["is_other"] = True
+    
+        # Set status for government donors
+        if row["donor_type"] == "Government":
+            if d in state_info:
+                donors[d]["status"] = state_info[d]["status"]
+                if latest and state_info[d].get("payment_status"):
+                    donors[d]["payment_status"] = state_info[d]["payment_status"]
+                    donors[d]["payment_date"] = state_info[d]["payment_date"]
+            else:
+                donors[d]["status"] = "nonmember"
+    
+        e, cat, amt = row["entity"], row["rev_cat"], row["amount"]
+        donors[d]["contributions"].setdefault(e, {})[cat] = donors[d]["contributions"].get(e, {}).get(cat, 0) + amt
+    
+    with open(out / f"donors-{year}.json", "w") as f:
+        json.dump(dict(donors), f, indent=2)
+    return f"donors-{year}.json: {len(donors)} donors"
 
-def export_contributor_trends_json(df: pd.DataFrame):
-    """Generate contributor-trends.json with time series data."""
+def export_donors_json(df: pd.DataFrame, state_info: dict, years: list[int], jobs: int = 1):
+    """Generate donors-{year}.json with contributions by donor (years in a process pool with jobs != 1)."""
+    from joblib import Parallel, delayed
+    latest = max(revenue_years(df), default=None)
+    tasks = (delayed(donors_year)(year, ydf, state_info, OUT, year == latest) for year, ydf in year_slices(df, years))
+    for line in Parallel(n_jobs=jobs)(tasks):
+        print(line)
+
+def donor_remainder(donors: list[dict]) -> dict:
+    """Count, total and per-category sums of donor entries cut from a by_donor list."""
+    out = {"count": len(donors), "total": 0}
+    for d in donors:
+        for k, v in d.items():
+            if k != "donor": out[k] = out.get(k, 0) + v
+    return out
+
+def entity_revenue_year(year: int, ydf: pd.DataFrame, top_k: int | None, out: Path) -> str:
+    """Write entity-revenue-{year}.json (and with `top_k` the donor lists); returns its summary line."""
+    entities, full_lists = {}, {}
+    
+    # Entities in order of first appearance
+    for entity, edf in ydf.groupby("entity", sort=False):
+        by_type = edf.groupby("rev_cat")["amount"].sum().to_dict()
+    
+        # Aggregate by donor (excluding "Other X" entries)
+        specific = edf[~edf["is_other"]]
+        donor_totals = defaultdict(lambda: {"donor": "", "total": 0})
+        for row in specific.to_dict(orient="records"):
+            d, cat, amt = row["donor_name"], row["rev_cat"], row["amount"]
+            donor_totals[d]["donor"] = d
+            donor_totals[d]["total"] += amt
+            donor_totals[d][cat] = donor_totals[d].get(cat, 0) + amt
+    
+        entities[entity] = {
+            "total": edf["amount"].sum(),
+            "year": year,
+            "by_type": by_type,
+            "by_donor": sorted(donor_totals.values(), key=lambda x: -x["total"])
+        }
+        by_donor = entities[entity]["by_donor"]
+        if top_k is not None and len(by_donor) > top_k:
+            full_lists[entity] = by_donor
+            entities[entity]["by_donor"] = by_donor[:top_k]
+            entities[entity]["other_donors"] = donor_remainder(by_donor[top_k:])
+    
+    with open(out / f"entity-revenue-{year}.json", "w") as f:
+        json.dump(entities, f, indent=2)
+    if top_k is not None:
+        with open(out / f"entity-revenue-donors-{year}.json", "w") as f:
+            json.dump(full_lists, f, indent=2)
+    return f"entity-revenue-{year}.json: {len(entities)} entities, ${sum(e['total'] for e in entities.values())/1e9:.1f}B"
+
+def export_entity_revenue_json(df: pd.DataFrame, years: list[int], top_k: int | None = None, jobs: int = 1):
+    """Generate entity-revenue-{year}.json with revenue by entity.
+
+    With `top_k`, by_donor keeps only the K largest donors and the rest is rolled
+    into other_donors; full lists go to entity-revenue-donors-{year}.json.
+    With jobs != 1 the years are exported in a process pool (-1 = all cores).
+    """
+    from joblib import Parallel, delayed
+    tasks = (delayed(entity_revenue_year)(year, ydf, top_k, OUT) for year, ydf in year_slices(df, years))
+    for line in Parallel(n_jobs=jobs)(tasks):
+        print(line)
+
+def export_contributor_trends_json(df: pd.DataFrame, years: list[int], fmt: str = "rows"):
+    """Generate contributor-trends.json with time series data (contributor-trends-sparse.json
+    with fmt="sparse", see TRENDS_FORMATS).
+
+    When only some `years` are given, per-contributor values for the other years
+    are taken from the existing file instead of being recomputed.
+    """
+    path = trends_path(OUT, "contributor-trends", fmt)
+    all_years = revenue_years(df)
+    patch = set(years) != set(all_years) and path.exists()
     gov_donors = set(df[df["donor_type"] == "Government"]["donor_name"].unique())
     nongov_df = df[(df["donor_type"] != "Government") & (~df["is_other"])]
     nongov_donors = set(nongov_df["donor_name"].unique())
@@ -110,9 +160,11 @@ def export_contributor_trends_json(df: pd.DataFrame):
     # Build contributor time series
     data = defaultdict(lambda: defaultdict(lambda: {"assessed": 0, "voluntary_earmarked": 0, "voluntary_unearmarked": 0, "total": 0}))
     
-    for _, row in df[~df["is_other"]].iterrows():
+    rows = df[~df["is_other"]]
+    if patch: rows = rows[rows["year"].isin(years)]
+    for _, row in rows.iterrows():
         year, donor, cat, amt = int(row["year"]), row["donor_name"], row["rev_cat"], row["amount"]
-        if year not in YEARS or pd.isna(amt): continue
+        if year not in all_years or pd.isna(amt): continue
         
         if cat == "Assessed":
             data[donor][year]["assessed"] += amt
@@ -121,13 +173,17 @@ def export_contributor_trends_json(df: pd.DataFrame):
         else:
             data[donor][year]["voluntary_earmarked"] += amt
         data[donor][year]["total"] += amt
+    if patch:
+        for donor, points in decode_trends(json.loads(path.read_text()), ["contributors"])["contributors"].items():
+            for p in points:
+                if p["year"] not in years: data[donor][p["year"]] = {k: p[k] for k in METRICS}
     
     # Build aggregates (gov, non-gov, all, and per-category)
     aggregates = {"gov": [], "non-gov": [], "all": []}
     for cat in categories:
         aggregates[f"cat:{cat}"] = []
     
-    for year in YEARS:
+    for year in all_years:
         gov_t = {"year": year, "assessed": 0, "voluntary_earmarked": 0, "voluntary_unearmarked": 0, "total": 0}
         nongov_t = {"year": year, "assessed": 0, "voluntary_earmarked": 0, "voluntary_unearmarked": 0, "total": 0}
         cat_totals = {cat: {"year": year, "assessed": 0, "voluntary_earmarked": 0, "voluntary_unearmarked": 0, "total": 0} for cat in categories}
@@ -144,15 +200,15 @@ def export_contributor_trends_json(df: pd.DataFrame):
         
         aggregates["gov"].append(gov_t)
         aggregates["non-gov"].append(nongov_t)
-        aggregates["all"].append({k: gov_t[k] + nongov_t[k] for k in gov_t})
+        aggregates["all"].append({"year": year, **{k: gov_t[k] + nongov_t[k] for k in METRICS}})
         for cat in categories:
             aggregates[f"cat:{cat}"].append(cat_totals[cat])
     
-    contributors = {d: [{"year": y, **data[d][y]} for y in YEARS] for d in sorted(gov_donors | nongov_donors)}
+    contributors = {d: [{"year": y, **data[d][y]} for y in all_years] for d in sorted(gov_donors | nongov_donors)}
     
     output = {
         "meta": {
-            "years": YEARS,
+            "years": all_years,
             "governmentContributors": sorted(gov_donors),
             "nonGovContributors": sorted(nongov_donors),
             "nonGovCategories": {cat: cat_to_donors[cat] for cat in categories},
@@ -161,16 +217,29 @@ def export_contributor_trends_json(df: pd.DataFrame):
         "contributors": contributors
     }
     
-    with open(OUT / "contributor-trends.json", "w") as f:
-        json.dump(output, f, indent=2)
-    print(f"contributor-trends.json: {len(contributors)} contributors, {len(categories)} categories")
+    with open(path, "w") as f:
+        if fmt == "sparse":
+            json.dump(encode_trends(output, ["aggregates", "contributors"], METRICS, 0), f, separators=(",", ":"))
+        else:
+            json.dump(output, f, indent=2)
+    print(f"{path.name}: {len(contributors)} contributors, {len(categories)} categories")
 
-if __name__ == "__main__":
-    print("Loading fused data...")
-    df, state_info = load_data()
-    print(f"Loaded {len(df)} rows, {len(state_info)} states")
+def run(years: list[int] | None = None, top_k: int | None = None, trends_format: str = "rows", jobs: int = 1):
+    revenue = revenue_rows()
+    years = select_years(years, revenue_years(revenue), "revenue")
+    state_info = load_states()
+    print(f"Loaded {len(state_info)} states")
     
-    export_donors_json(df, state_info)
-    export_entity_revenue_json(df)
-    export_contributor_trends_json(df)
+    export_donors_json(revenue, state_info, years, jobs)
+    export_entity_revenue_json(revenue, years, top_k, jobs)
+    export_contributor_trends_json(revenue, years, trends_format)
     print("Done.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=parse_years, help="only rebuild these years, e.g. 2024 or 2022-2024")
+    parser.add_argument("--top-k", type=int, help="keep only the top K donors per entity inline (full lists in detail files)")
+    parser.add_argument("--trends-format", choices=TRENDS_FORMATS, default="rows", help="encoding of the trends file")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for per-year export (-1 = all cores)")
+    args = parser.parse_args()
+    run(years=args.years, top_k=args.top_k, trends_format=args.trends_format, jobs=args.jobs)
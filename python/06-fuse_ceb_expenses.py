@@ -4,13 +4,15 @@ Tiered approach:
 - All years: CEB entities (49 entities)
 - 2019-2023: Replace UN/UN-DPO with secretariat sub-entities, add assessed for UNEP/UNODC
 """
+import argparse
+import json
 import pandas as pd
 from pathlib import Path
-from utils import normalize_entity
+from checks import run_checks, unique_keys, year_coverage, total_range, non_negative, within_tolerance, at_least, expect
+from utils import aggregate_ceb_csv, normalize_entity, normalize_entities, parse_years, read_ceb_csv, replace_years
 
 ceb_dir = Path("data/ceb")
 clean, fused = ceb_dir / "clean", ceb_dir / "fused"
-fused.mkdir(exist_ok=True)
 
 # Entities to exclude from secretariat (use CEB instead)
 EXCLUDE_FROM_SEC = {"ITC", "UNHCR", "UNRWA"}
@@ -19,10 +21,12 @@ ADD_ASSESSED = {"UNEP", "UNODC"}
 # CEB aggregates replaced by secretariat breakdown
 REPLACE_AGGREGATES = {"UN", "UN-DPO"}
 
-def load_ceb() -> pd.DataFrame:
-    df = pd.read_csv(clean / "expenses_sub_agency.csv")
+def load_ceb(chunksize: int | None = None) -> pd.DataFrame:
+    """CEB expenses; with `chunksize` the file is streamed and summed per key in bounded memory."""
+    path = clean / "expenses_sub_agency.csv"
+    df = read_ceb_csv(path) if chunksize is None else aggregate_ceb_csv(path, chunksize)
     df = df.rename(columns={"agency": "entity", "calendar_year": "year"})
-    df["entity"] = df["entity"].apply(normalize_entity)
+    df["entity"] = normalize_entities(df["entity"])
     return df[["year", "entity", "amount"]].copy()
 
 def load_secretariat() -> pd.DataFrame:
@@ -31,16 +35,19 @@ def load_secretariat() -> pd.DataFrame:
     df["entity"] = df["entity"].apply(normalize_entity)
     return df[["year", "entity", "amount", "source_type"]].copy()
 
-def fuse_expenses():
-    ceb = load_ceb()
+def fuse_expenses(only_years: list[int] | None = None, chunksize: int | None = None):
+    """Fuse all years, or only `only_years` and splice them into the existing fused CSV."""
+    fused.mkdir(exist_ok=True)
+    ceb = load_ceb(chunksize)
     sec = load_secretariat()
     
     years = sorted(ceb["year"].unique())
     sec_years = set(sec["year"].unique())  # 2019-2023
     
+    build_years = [y for y in years if y in only_years] if only_years else years
     results = []
     
-    for year in years:
+    for year in build_years:
         ceb_year = ceb[ceb["year"] == year]
         
         if year in sec_years:
@@ -73,82 +80,58 @@ def fuse_expenses():
     # Aggregate by year/entity (combines CEB + assessed for UNEP/UNODC)
     df = df.groupby(["year", "entity"]).agg({"amount": "sum", "source": "first"}).reset_index()
     df = df.sort_values(["year", "entity"])
+    if only_years:
+        df = replace_years(fused / "expenses.csv", df, build_years)
+        print(f"Rebuilt years {[int(y) for y in build_years]}")
     
     df.to_csv(fused / "expenses.csv", index=False)
     print(f"Wrote {len(df)} rows to {fused / 'expenses.csv'}")
+    # Fusion years are picked up by 99-generate_manifest.py
+    fusion_years = sorted(int(y) for y in sec_years & set(years))
+    (fused / "expenses_meta.json").write_text(json.dumps({"fusionYears": fusion_years}))
     
     validate(df, ceb, sec)
     return df
 
 def validate(df: pd.DataFrame, ceb: pd.DataFrame, sec: pd.DataFrame):
+    """Run data-quality checks on fused data; raises ValidationError with the full report on failure."""
     print("\n=== Validation ===")
     sec_years = set(sec["year"].unique())
+    fusion, ceb_fusion = df["year"].isin(sec_years), ceb["year"].isin(sec_years)
+    frames = {
+        "fused": df,
+        "fused:ceb-only": df[~fusion], "ceb:ceb-only": ceb[~ceb_fusion],
+        "fused:add-assessed": df[fusion & df["entity"].isin(ADD_ASSESSED)],
+        "ceb:add-assessed": ceb[ceb_fusion & ceb["entity"].isin(ADD_ASSESSED)],
+    }
+    report = run_checks(frames, [
+        unique_keys("fused", ["year", "entity"]),
+        year_coverage("fused", range(2011, 2025), exact=True),
+        total_range("fused", low=30e9, high=100e9),
+        # Negative entity totals can be legitimate for fund wind-downs
+        non_negative("fused", ["year", "entity"]),
+        # Non-fusion years: should match CEB exactly
+        within_tolerance("fused:ceb-only", "ceb:ceb-only", pct=0.1),
+        # Fusion years: secretariat assessed is additive for UNEP/UNODC
+        at_least("fused:add-assessed", "ceb:add-assessed", by=["year", "entity"]),
+        expect("fused", "overlap entities sourced from CEB",
+               lambda d: d["year"].isin(sec_years) & d["entity"].isin(EXCLUDE_FROM_SEC) & (d["source"] != "ceb")),
+    ])
     
-    # 1. No duplicate entity/year combinations
-    dups = df.groupby(["year", "entity"]).size()
-    assert (dups == 1).all(), f"Duplicate entity/year: {dups[dups > 1].to_dict()}"
-    print("✓ No duplicate entity/year combinations")
-    
-    # 2. Year coverage
-    expected_years = set(range(2011, 2025))
-    actual_years = set(df["year"].unique())
-    assert expected_years == actual_years, f"Missing years: {expected_years - actual_years}"
-    print(f"✓ All {len(expected_years)} years present (2011-2024)")
-    
-    # 3. Per-year validation
-    print("\nPer-year totals:")
-    for year in sorted(df["year"].unique()):
-        yr = df[df["year"] == year]
-        fused_total = yr["amount"].sum()
-        ceb_total = ceb[ceb["year"] == year]["amount"].sum()
-        n_entities = yr["entity"].nunique()
-        
-        # Total sanity check
-        assert fused_total > 30e9, f"{year}: Total ${fused_total/1e9:.1f}B too low"
-        assert fused_total < 100e9, f"{year}: Total ${fused_total/1e9:.1f}B too high"
-        
-        # Check for negative entity totals (can be legitimate for fund wind-downs)
-        neg = yr[yr["amount"] < 0]
-        if len(neg) > 0:
-            for _, r in neg.iterrows():
-                print(f"    ⚠ {r['entity']}: ${r['amount']/1e6:.2f}M (negative)")
-        
-        if year in sec_years:
-            # Fusion years: verify secretariat coverage
-            ceb_un = ceb[(ceb["year"] == year) & (ceb["entity"].isin(REPLACE_AGGREGATES))]["amount"].sum()
-            sec_total = sec[sec["year"] == year]["amount"].sum()
-            coverage = sec_total / ceb_un * 100 if ceb_un > 0 else 0
-            
-            # Verify UNEP/UNODC assessed additions
-            for entity in ADD_ASSESSED:
-                fused_amt = yr[yr["entity"] == entity]["amount"].sum()
-                ceb_amt = ceb[(ceb["year"] == year) & (ceb["entity"] == entity)]["amount"].sum()
-                assert fused_amt >= ceb_amt, f"{year} {entity}: Fused ${fused_amt/1e6:.0f}M < CEB ${ceb_amt/1e6:.0f}M"
-            
-            print(f"  {year}: {n_entities} entities, ${fused_total/1e9:.1f}B (CEB: ${ceb_total/1e9:.1f}B, sec coverage: {coverage:.0f}%) ✓")
-        else:
-            # Non-fusion years: should match CEB exactly
-            diff_pct = abs(fused_total - ceb_total) / ceb_total * 100
-            assert diff_pct < 0.1, f"{year}: Fused differs from CEB by {diff_pct:.2f}%"
-            print(f"  {year}: {n_entities} entities, ${fused_total/1e9:.1f}B ✓")
-    
-    # 4. Entity source distribution
-    print("\nSource distribution:")
-    for source in df["source"].unique():
-        n = df[df["source"] == source]["entity"].nunique()
-        total = df[df["source"] == source]["amount"].sum()
-        print(f"  {source}: {n} entities, ${total/1e9:.1f}B")
-    
-    # 5. Verify overlap entities use correct source
-    for year in sec_years:
-        yr = df[df["year"] == year]
-        for entity in EXCLUDE_FROM_SEC:
-            rows = yr[yr["entity"] == entity]
-            if len(rows) > 0:
-                assert rows.iloc[0]["source"] == "ceb", f"{year} {entity}: Should be CEB, got {rows.iloc[0]['source']}"
-    print("✓ Overlap entities correctly sourced from CEB")
-    
-    print("\n✓ All validations passed")
+    print("Source distribution:")
+    for source, g in df.groupby("source"):
+        print(f"  {source}: {g['entity'].nunique()} entities, ${g['amount'].sum()/1e9:.1f}B")
+    print()
+    report.print()
+    report.raise_on_error()
+    return report
+
+def run(years: list[int] | None = None, chunksize: int | None = None):
+    fuse_expenses(years, chunksize)
 
 if __name__ == "__main__":
-    fuse_expenses()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=parse_years, help="only rebuild these years, e.g. 2024 or 2022-2024")
+    parser.add_argument("--chunksize", type=int, help="stream the CEB file in chunks of this many rows, summing amounts per key")
+    args = parser.parse_args()
+    run(args.years, args.chunksize)
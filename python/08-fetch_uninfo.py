@@ -8,7 +8,6 @@ from tqdm import tqdm
 memory = Memory(location=".cache", verbose=0)
 BASE = "https://api.uninfo.org/v1.0"
 OUT = Path("data/uninfo/raw")
-OUT.mkdir(parents=True, exist_ok=True)
 
 @memory.cache
 def get(url: str, params: dict = None) -> dict:
@@ -82,6 +81,7 @@ def extract_metrics(item: dict) -> dict:
     }
 
 if __name__ == "__main__":
+    OUT.mkdir(parents=True, exist_ok=True)
     print("Fetching workspace mapping...")
     workspaces = fetch_workspaces()
     (OUT / "workspaces.json").write_text(json.dumps(workspaces, indent=2, ensure_ascii=False))
@@ -1,68 +1,122 @@
 """Generate entity-trends.json from CEB revenue and expenses data."""
+import argparse
 import json
 import pandas as pd
 from pathlib import Path
 from collections import defaultdict
-from utils import normalize_entity
+from store import query
+from utils import TRENDS_FORMATS, decode_trends, encode_trends, parse_years, select_years, trends_path
 
 DATA = Path("public/data")
-YEARS = list(range(2011, 2025))
+# First year exported; the last is the latest year with revenue or expenses in the store
+FIRST_YEAR = 2011
 
-def load_revenue() -> dict[str, dict[int, float]]:
-    """Load revenue from fused CSV, aggregated by entity."""
-    df = pd.read_csv("data/ceb/fused/revenue_by_contributor.csv")
-    df["entity"] = df["entity"].apply(normalize_entity)
-    agg = df.groupby(["entity", "year"])["amount"].sum().reset_index()
-    data = defaultdict(dict)
-    for _, row in agg.iterrows():
-        data[row["entity"]][row["year"]] = row["amount"]
-    return dict(data)
+def year_matrix(table: str) -> pd.DataFrame:
+    """Entity x year matrix of summed amounts from a store table (NaN where an entity has no data for a year)."""
+    df = query(f"SELECT entity, year, amount FROM {table} ORDER BY rowid").astype({"entity": "category"})
+    return df.groupby(["entity", "year"], observed=True)["amount"].sum().unstack()
 
-def load_expenses() -> dict[str, dict[int, float]]:
-    """Load expenses from CEB clean CSV (not fused, for consistency)."""
-    df = pd.read_csv("data/ceb/clean/expenses_sub_agency.csv")
-    df["agency"] = df["agency"].apply(normalize_entity)
-    agg = df.groupby(["agency", "calendar_year"])["amount"].sum().reset_index()
-    data = defaultdict(dict)
-    for _, row in agg.iterrows():
-        data[row["agency"]][row["calendar_year"]] = row["amount"]
-    return dict(data)
+def load_revenue() -> pd.DataFrame:
+    """Load fused revenue as an entity x year matrix."""
+    return year_matrix("revenue")
 
-def main():
+def load_expenses() -> pd.DataFrame:
+    """Load expenses from the CEB clean table (not fused, for consistency) as an entity x year matrix."""
+    return year_matrix("ceb_expenses_sub_agency")
+
+def data_years(*matrices: pd.DataFrame) -> list[int]:
+    """FIRST_YEAR through the latest year column of any of the matrices."""
+    last = max((int(m.columns.max()) for m in matrices if len(m.columns)), default=None)
+    return list(range(FIRST_YEAR, last + 1)) if last is not None else []
+
+def year_span(matrix: pd.DataFrame) -> str:
+    """First-last year with data in the matrix, for the summary."""
+    years = matrix.columns[matrix.notna().any()]
+    return f"{years[0]}-{years[-1]}" if len(years) else "no data"
+
+def to_json_values(matrix: pd.DataFrame, zero_as_null: bool = False) -> pd.DataFrame:
+    """Python floats with None for missing (and optionally zero) cells."""
+    missing = matrix.isna() | (matrix == 0) if zero_as_null else matrix.isna()
+    return matrix.astype(object).where(~missing, None)
+
+def series(rev: pd.DataFrame, exp: pd.DataFrame) -> dict[str, list]:
+    """Row label -> [{year, revenue, expenses}] over the matrix columns."""
+    return {k: [{"year": y, "revenue": r, "expenses": e} for y, r, e in zip(rev.columns, rev.loc[k], exp.loc[k])]
+            for k in rev.index}
+
+def patch_series(previous: dict[str, list], current: dict[str, list], years: list[int], all_years: list[int],
+                 drop_empty: bool = True) -> dict[str, list]:
+    """Previous series with the points for `years` replaced by `current`'s, over `all_years`
+    (optionally dropping all-null ones)."""
+    merged = {}
+    for k in sorted(set(previous) | set(current)):
+        points = {p["year"]: p for p in previous.get(k, []) if p["year"] not in years}
+        points.update({p["year"]: p for p in current.get(k, [])})
+        points = [points.get(y, {"year": y, "revenue": None, "expenses": None}) for y in all_years]
+        if not drop_empty or any(p["revenue"] is not None or p["expenses"] is not None for p in points):
+            merged[k] = points
+    return merged
+
+def run(years: list[int] | None = None, trends_format: str = "rows"):
+    """Rebuild entity-trends.json (entity-trends-sparse.json with trends_format="sparse"),
+    or with `years` only patch those years into the existing file."""
     entities = json.loads((DATA / "entities.json").read_text())
     entity_to_group = {e["entity"]: e.get("system_grouping", "Other") for e in entities}
     groups = list(dict.fromkeys(e.get("system_grouping") for e in entities if e.get("system_grouping")))
-    
+    out_path = trends_path(DATA, "entity-trends", trends_format)
     rev, exp = load_revenue(), load_expenses()
-    all_entities = sorted(set(rev) | set(exp))
+    all_years = data_years(rev, exp)
+    years = select_years(years, all_years, "revenue or expenses")
+    patch = years != all_years and out_path.exists()
+    columns = years if patch else all_years
+    
+    if patch:
+        # Only entities with data in the patched years
+        rev, exp = (m.reindex(columns=columns).dropna(how="all") for m in (rev, exp))
+    all_entities = sorted(set(rev.index) | set(exp.index))
+    # Align both matrices on the full entity x year grid
+    rev, exp = (m.reindex(index=all_entities, columns=columns) for m in (rev, exp))
     
     entities_by_group = defaultdict(list)
     for e in all_entities:
         entities_by_group[entity_to_group.get(e, "Other")].append(e)
+    group_of = pd.Series({e: entity_to_group.get(e, "Other") for e in all_entities}, dtype=object)
     
-    def year_series(entity_set):
-        return [{"year": y,
-                 "revenue": sum(rev.get(e, {}).get(y, 0) or 0 for e in entity_set) or None,
-                 "expenses": sum(exp.get(e, {}).get(y, 0) or 0 for e in entity_set) or None}
-                for y in YEARS]
+    # Group and overall totals by matrix reduction; empty sums are reported as null
+    rev_groups = rev.groupby(group_of).sum().reindex(groups)
+    exp_groups = exp.groupby(group_of).sum().reindex(groups)
+    rev_groups.loc["all"], exp_groups.loc["all"] = rev.sum(), exp.sum()
+    group_series = series(to_json_values(rev_groups, zero_as_null=True), to_json_values(exp_groups, zero_as_null=True))
+    entity_series = series(to_json_values(rev), to_json_values(exp))
+    if patch:
+        previous = decode_trends(json.loads(out_path.read_text()), ["aggregates", "entities"])
+        group_series = patch_series(previous["aggregates"], group_series, columns, all_years, drop_empty=False)
+        entity_series = patch_series(previous["entities"], entity_series, columns, all_years)
+        entities_by_group = defaultdict(list)
+        for e in entity_series:
+            entities_by_group[entity_to_group.get(e, "Other")].append(e)
     
     output = {
-        "meta": {"years": YEARS, "systemGroups": groups,
+        "meta": {"years": all_years, "systemGroups": groups,
                  "entitiesByGroup": {g: entities_by_group[g] for g in groups if g in entities_by_group}},
-        "aggregates": {"all": year_series(all_entities), **{g: year_series(entities_by_group[g]) for g in groups}},
-        "entities": {e: [{"year": y, "revenue": rev.get(e, {}).get(y), "expenses": exp.get(e, {}).get(y)} for y in YEARS]
-                     for e in all_entities}
+        "aggregates": {"all": group_series["all"], **{g: group_series[g] for g in groups}},
+        "entities": entity_series,
     }
     
-    out_path = DATA / "entity-trends.json"
-    out_path.write_text(json.dumps(output, indent=2))
+    if trends_format == "sparse":
+        out_path.write_text(json.dumps(encode_trends(output, ["aggregates", "entities"], ["revenue", "expenses"], None),
+                                       separators=(",", ":")))
+    else:
+        out_path.write_text(json.dumps(output, indent=2))
     
     # Summary
-    rev_years = sorted(set(y for d in rev.values() for y in d.keys()))
-    exp_years = sorted(set(y for d in exp.values() for y in d.keys()))
-    print(f"Revenue: {len(rev)} entities, {rev_years[0]}-{rev_years[-1]}")
-    print(f"Expenses: {len(exp)} entities, {exp_years[0]}-{exp_years[-1]}")
+    print(f"Revenue: {rev.notna().any(axis=1).sum()} entities, {year_span(rev)}")
+    print(f"Expenses: {exp.notna().any(axis=1).sum()} entities, {year_span(exp)}")
     print(f"Wrote {out_path}: {len(output['entities'])} entities, {len(groups)} groups")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=parse_years, help="only patch these years into entity-trends.json")
+    parser.add_argument("--trends-format", choices=TRENDS_FORMATS, default="rows", help="encoding of the trends file")
+    args = parser.parse_args()
+    run(years=args.years, trends_format=args.trends_format)
@@ -1,16 +1,24 @@
 """Export UNINFO Cooperation Framework data to JSON for frontend."""
+import argparse
+import hashlib
+import heapq
 import json
+from functools import cache
 from pathlib import Path
 from collections import defaultdict
-import country_converter as coco
+from utils import JsonObjectFile, country_converter
 
 RAW = Path("data/uninfo/raw")
 OUT = Path("public/data")
 COUNTRIES_DIR = OUT / "uninfo-countries"
-cc = coco.CountryConverter()
+# Input hashes of the last export per country, for skipping unchanged ones
+HASHES = Path("data/uninfo/export_hashes.json")
+# Bump when the per-country file format changes to force a full rewrite
+EXPORT_VERSION = 1
 
+@cache
 def get_iso3(country: str) -> str | None:
-    result = cc.convert(country, to="ISO3", not_found=None)
+    result = country_converter().convert(country, to="ISO3", not_found=None)
     return result[0] if isinstance(result, list) else result
 
 def extract_metrics(item: dict) -> dict:
@@ -22,38 +30,45 @@ def extract_metrics(item: dict) -> dict:
     }
 
 def load_raw():
-    frameworks_path = RAW / "frameworks_by_country.json"
+    """Small files are parsed whole; the per-country dumps are streamed one country at a time.
+    Only the frameworks dump is optional."""
     return {
         "workspaces": json.loads((RAW / "workspaces.json").read_text()),
         "global_sdgs": json.loads((RAW / "global_sdgs.json").read_text()),
-        "countries_sdgs": json.loads((RAW / "countries_sdgs.json").read_text()),
-        "projects": json.loads((RAW / "projects_by_country.json").read_text()),
-        "frameworks": json.loads(frameworks_path.read_text()) if frameworks_path.exists() else {},
+        "countries_sdgs": JsonObjectFile(RAW / "countries_sdgs.json"),
+        "projects": JsonObjectFile(RAW / "projects_by_country.json"),
+        "frameworks": JsonObjectFile(RAW / "frameworks_by_country.json", optional=True),
     }
 
+def build_projects(agencies: list) -> list[dict]:
+    """Flatten one country's raw agency list into project records."""
+    projects = []
+    for agency in agencies:
+        abbr = agency.get("abbreviation", "")
+        for proj in agency.get("planEntities", []):
+            m = extract_metrics(proj)
+            sdg = proj["sdgs"][0].get("id") if proj.get("sdgs") else None
+            projects.append({
+                "id": proj.get("id"),
+                "agency": abbr,
+                "sdg": sdg,
+                "code": proj.get("code", ""),
+                "name": proj.get("name", "")[:200],
+                "description": (proj.get("description") or "")[:500] or None,
+                "start": proj.get("startDate"),
+                "end": proj.get("endDate"),
+                "outcome": (proj.get("parentName") or "")[:200] or None,
+                **m,
+            })
+    return projects
+
 def build_projects_by_country(data: dict) -> dict[str, list]:
     """Build projects list grouped by ISO3 code."""
     by_country = defaultdict(list)
     for country, agencies in data["projects"].items():
         iso3 = get_iso3(country)
         if not iso3 or not isinstance(agencies, list): continue
-        for agency in agencies:
-            abbr = agency.get("abbreviation", "")
-            for proj in agency.get("planEntities", []):
-                m = extract_metrics(proj)
-                sdg = proj["sdgs"][0].get("id") if proj.get("sdgs") else None
-                by_country[iso3].append({
-                    "id": proj.get("id"),
-                    "agency": abbr,
-                    "sdg": sdg,
-                    "code": proj.get("code", ""),
-                    "name": proj.get("name", "")[:200],
-                    "description": (proj.get("description") or "")[:500] or None,
-                    "start": proj.get("startDate"),
-                    "end": proj.get("endDate"),
-                    "outcome": (proj.get("parentName") or "")[:200] or None,
-                    **m,
-                })
+        by_country[iso3].extend(build_projects(agencies))
     # Sort each country's projects by required descending
     for iso3 in by_country:
         by_country[iso3].sort(key=lambda x: -x["required"])
@@ -124,100 +139,146 @@ def build_framework_tree(fw: dict) -> list[dict] | None:
     
     return tree if tree else None
 
-def export_per_country(data: dict) -> dict:
-    """Export per-country files with SDG breakdown, projects, and framework."""
-    COUNTRIES_DIR.mkdir(exist_ok=True)
-    
-    # Build projects lookup
-    projects_by_country = build_projects_by_country(data)
-    
-    # Build framework lookup by country name
-    frameworks_by_country = {}
-    for country, fw in data.get("frameworks", {}).items():
+def sum_sdgs(info: dict) -> tuple[dict, dict]:
+    """Per-SDG metrics and totals for one country."""
+    sdgs = {}
+    totals = {"required": 0, "available": 0, "spent": 0}
+    for sdg in info.get("sdgs", []):
+        if not sdg.get("id"): continue
+        m = extract_metrics(sdg)
+        sdgs[str(sdg["id"])] = m
+        for k in totals: totals[k] += m[k]
+    return sdgs, totals
+
+def group_country_inputs(data: dict) -> dict[str, dict]:
+    """Locate the raw inputs of each exported country by ISO3, in export order.
+
+    Each raw file is streamed once and only byte spans are kept; read_inputs loads
+    one country's inputs at a time. Several names can resolve to one ISO3: projects
+    are combined, and the last name with data provides the SDG breakdown (matching
+    the file it would overwrite).
+    """
+    projects, has_projects = defaultdict(list), set()
+    for country, agencies, span in data["projects"].members():
         iso3 = get_iso3(country)
-        if iso3:
-            frameworks_by_country[iso3] = build_framework_tree(fw)
-    
-    # Build country data with SDGs, projects, and framework
-    countries_index = {}
-    total_projects = 0
-    framework_count = 0
+        if not iso3 or not isinstance(agencies, list): continue
+        projects[iso3].append(span)
+        if any(a.get("planEntities") for a in agencies): has_projects.add(iso3)
+    frameworks = {}
+    for country, _, span in data["frameworks"].members():
+        iso3 = get_iso3(country)
+        if iso3: frameworks[iso3] = span
     
-    for country, info in data["countries_sdgs"].items():
+    inputs = {}
+    for country, info, span in data["countries_sdgs"].members():
         iso3 = get_iso3(country)
         if not iso3: continue
-        
-        ws_id = info["workspace_id"]
-        sdgs = {}
-        totals = {"required": 0, "available": 0, "spent": 0}
-        
-        for sdg in info.get("sdgs", []):
-            if not sdg.get("id"): continue
-            m = extract_metrics(sdg)
-            sdgs[str(sdg["id"])] = m
-            for k in totals: totals[k] += m[k]
-        
-        projects = projects_by_country.get(iso3, [])
-        framework = frameworks_by_country.get(iso3)
-        
+        _, totals = sum_sdgs(info)
         # Skip countries with no data
-        if totals["required"] <= 0 and not projects:
-            continue
-        
-        country_data = {
-            "workspace_id": ws_id,
-            "name": country,
-            "totals": {k: round(v, 2) for k, v in totals.items()},
-            "sdgs": sdgs,
-            "projects": projects,
-        }
-        if framework:
-            country_data["framework"] = framework
-            framework_count += 1
-        
-        # Write per-country file
-        (COUNTRIES_DIR / f"{iso3}.json").write_text(json.dumps(country_data))
-        
-        # Store in index (without projects/framework for smaller index file)
-        countries_index[iso3] = {
-            "workspace_id": ws_id,
-            "name": country,
+        if totals["required"] <= 0 and iso3 not in has_projects: continue
+        inputs[iso3] = {"name": country, "info": span, "projects": projects[iso3], "framework": frameworks.get(iso3)}
+    return inputs
+
+def read_inputs(data: dict, spans: dict) -> dict:
+    """One country's raw inputs from the spans found by group_country_inputs."""
+    return {
+        "name": spans["name"],
+        "info": data["countries_sdgs"].read(spans["info"]),
+        "projects": [data["projects"].read(span) for span in spans["projects"]],
+        "framework": data["frameworks"].read(spans["framework"]) if spans["framework"] else None,
+    }
+
+def input_hash(inputs: dict) -> str:
+    payload = json.dumps([EXPORT_VERSION, inputs], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def export_country(iso3: str, inputs: dict, out_dir: Path) -> dict:
+    """Build and write one uninfo-countries/{ISO3}.json; returns its index entry and SDG metrics."""
+    sdgs, totals = sum_sdgs(inputs["info"])
+    projects = [p for agencies in inputs["projects"] for p in build_projects(agencies)]
+    projects.sort(key=lambda x: -x["required"])
+    framework = build_framework_tree(inputs["framework"]) if inputs["framework"] else None
+    
+    country_data = {
+        "workspace_id": inputs["info"]["workspace_id"],
+        "name": inputs["name"],
+        "totals": {k: round(v, 2) for k, v in totals.items()},
+        "sdgs": sdgs,
+        "projects": projects,
+    }
+    if framework:
+        country_data["framework"] = framework
+    (out_dir / f"{iso3}.json").write_text(json.dumps(country_data))
+    
+    # Index entry (without projects/framework for smaller index file)
+    return {
+        "index": {
+            "workspace_id": country_data["workspace_id"],
+            "name": inputs["name"],
             "totals": country_data["totals"],
             "project_count": len(projects),
             "has_framework": framework is not None,
-        }
-        total_projects += len(projects)
+        },
+        "sdgs": sdgs,
+    }
+
+def export_per_country(data: dict, jobs: int = 1, force: bool = False) -> tuple[dict, dict]:
+    """Export per-country files with SDG breakdown, projects, and framework.
+
+    Countries whose raw inputs hash the same as in the last run (and whose file
+    still exists) are not rebuilt. With jobs != 1 the remaining countries are
+    built and written in a process pool (-1 = all cores).
+    Returns the countries index and an SDG -> {iso3: metrics} index for export_sdgs.
+    """
+    from joblib import Parallel, delayed
+    COUNTRIES_DIR.mkdir(exist_ok=True)
+    previous = json.loads(HASHES.read_text()) if HASHES.exists() and not force else {}
+    
+    inputs = group_country_inputs(data)
+    hashes, stale = {}, []
+    def stale_countries():
+        # Read lazily so that only the countries being built are in memory
+        for iso3, spans in inputs.items():
+            country = read_inputs(data, spans)
+            hashes[iso3] = input_hash(country)
+            if previous.get(iso3, {}).get("hash") != hashes[iso3] or not (COUNTRIES_DIR / f"{iso3}.json").exists():
+                stale.append(iso3)
+                yield delayed(export_country)(iso3, country, COUNTRIES_DIR)
+    built = Parallel(n_jobs=jobs)(stale_countries())
+    results = {**{iso3: previous[iso3] for iso3 in inputs if iso3 not in stale}, **dict(zip(stale, built))}
+    
+    countries_index = {iso3: results[iso3]["index"] for iso3 in inputs}
+    HASHES.parent.mkdir(parents=True, exist_ok=True)
+    HASHES.write_text(json.dumps({iso3: {"hash": hashes[iso3], **results[iso3]} for iso3 in inputs}))
     
     # Write index file (for quick lookups without loading full data)
     (OUT / "uninfo-countries-index.json").write_text(json.dumps(countries_index, indent=2))
     
-    print(f"uninfo-countries/: {len(countries_index)} country files")
+    print(f"uninfo-countries/: {len(countries_index)} country files ({len(stale)} rebuilt, {len(inputs) - len(stale)} unchanged)")
     print(f"uninfo-countries-index.json: index with {len(countries_index)} countries")
-    print(f"Total projects: {total_projects:,}")
-    print(f"Countries with framework: {framework_count}")
-    return countries_index
+    print(f"Total projects: {sum(c['project_count'] for c in countries_index.values()):,}")
+    print(f"Countries with framework: {sum(c['has_framework'] for c in countries_index.values())}")
+    
+    # Invert to SDG -> country metrics (country order follows the index)
+    sdg_index = defaultdict(dict)
+    for iso3 in inputs:
+        for sdg_id, m in results[iso3]["sdgs"].items():
+            sdg_index[sdg_id][iso3] = m
+    return countries_index, dict(sdg_index)
 
-def export_sdgs(data: dict, countries_index: dict) -> dict:
-    """Export per-SDG data with country breakdown."""
-    # Need to load SDG data from country files
+def export_sdgs(data: dict, sdg_index: dict) -> dict:
+    """Export per-SDG data with country breakdown from the index built by export_per_country."""
     result = {}
     for sdg in data["global_sdgs"]:
         if not sdg.get("id"): continue
         sdg_id = str(sdg["id"])
         m = extract_metrics(sdg)
         
-        # Build country breakdown by reading from country files
-        country_breakdown = {}
-        for iso3 in countries_index:
-            country_file = COUNTRIES_DIR / f"{iso3}.json"
-            if country_file.exists():
-                cdata = json.loads(country_file.read_text())
-                if sdg_id in cdata.get("sdgs", {}):
-                    country_breakdown[iso3] = cdata["sdgs"][sdg_id]
+        country_breakdown = sdg_index.get(sdg_id, {})
         
         # Top underfunded = highest gap (required - available)
-        gaps = [(iso3, c["required"] - c["available"]) for iso3, c in country_breakdown.items()]
-        top_underfunded = [iso3 for iso3, _ in sorted(gaps, key=lambda x: -x[1])[:10]]
+        gaps = ((iso3, c["required"] - c["available"]) for iso3, c in country_breakdown.items())
+        top_underfunded = [iso3 for iso3, _ in heapq.nlargest(10, gaps, key=lambda x: x[1])]
         
         result[sdg_id] = {
             "name": sdg.get("short", sdg.get("name", "")),
@@ -230,15 +291,6 @@ def export_sdgs(data: dict, countries_index: dict) -> dict:
     print(f"uninfo-sdgs.json: {len(result)} SDGs")
     return result
 
-def update_manifest():
-    """Update manifest with UNINFO data availability."""
-    manifest_path = OUT / "manifest.json"
-    manifest = json.loads(manifest_path.read_text())
-    manifest["uninfoCountries"] = {"years": [2024], "default": 2024, "min": 2024, "max": 2024}
-    manifest["uninfoSdgs"] = {"years": [2024], "default": 2024, "min": 2024, "max": 2024}
-    manifest_path.write_text(json.dumps(manifest, indent=2))
-    print("manifest.json: updated")
-
 def cleanup_old_files():
     """Remove deprecated files."""
     old_files = [OUT / "uninfo-countries.json", OUT / "uninfo-projects.json"]
@@ -247,20 +299,24 @@ def cleanup_old_files():
             f.unlink()
             print(f"Removed deprecated: {f.name}")
 
-if __name__ == "__main__":
+def run(jobs: int = 1, force: bool = False):
     print("Loading raw UNINFO data...")
     data = load_raw()
     
     print("\nExporting per-country data...")
-    countries_index = export_per_country(data)
+    countries_index, sdg_index = export_per_country(data, jobs=jobs, force=force)
     
     print("\nExporting SDGs...")
-    export_sdgs(data, countries_index)
-    
-    print("\nUpdating manifest...")
-    update_manifest()
+    export_sdgs(data, sdg_index)
     
     print("\nCleaning up old files...")
     cleanup_old_files()
     
     print("\nDone.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for per-country export (-1 = all cores)")
+    parser.add_argument("--force", action="store_true", help="rebuild all country files even if inputs are unchanged")
+    args = parser.parse_args()
+    run(jobs=args.jobs, force=args.force)
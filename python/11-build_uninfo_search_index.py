@@ -0,0 +1,119 @@
+"""Build a sharded full-text search index over UNINFO projects and framework nodes.
+
+Tokens from project and framework names/descriptions map to postings grouped by
+country and kind ("p" = project, "f" = framework node): {ISO3: {kind: ids}}, with
+each id list ascending and delta-encoded (first id, then differences).
+
+Shards are keyed by token prefix: while a prefix's tokens exceed SHARD_BYTES, its
+largest one-character-longer prefixes get shards of their own, so shards stay under
+the budget (unless a single token is bigger) without scattering small prefixes over
+many files. A search for "education" or "climate" fetches a single small file
+instead of every country file: a token's shard is the longest prefix in
+uninfo-search-index.json that it starts with.
+"""
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+
+OUT = Path("public/data")
+COUNTRIES_DIR = OUT / "uninfo-countries"
+SEARCH_DIR = OUT / "uninfo-search"
+MIN_TOKEN_LEN = 3
+# Shards are split until their JSON fits this size (unless a single token is bigger)
+SHARD_BYTES = 64 * 1024
+
+# English/French/Spanish function words that would only bloat the shards
+STOPWORDS = {
+    "and", "the", "for", "with", "from", "into", "that", "this", "are", "its", "their", "through", "including",
+    "les", "des", "pour", "dans", "par", "une", "sur", "aux", "avec",
+    "los", "las", "del", "para", "con", "por", "una", "que",
+}
+
+def tokenize(text: str | None) -> set[str]:
+    """Lowercased, accent-stripped alphanumeric tokens."""
+    if not text: return set()
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return {t for t in re.findall(r"[a-z0-9]+", text)
+            if len(t) >= MIN_TOKEN_LEN and not t.isdigit() and t not in STOPWORDS}
+
+def load_countries() -> dict[str, dict]:
+    return {f.stem: json.loads(f.read_text()) for f in sorted(COUNTRIES_DIR.glob("*.json"))}
+
+def walk_framework(nodes: list[dict]):
+    for node in nodes:
+        yield node
+        yield from walk_framework(node.get("children") or [])
+
+def compact(postings: set[tuple]) -> dict[str, dict]:
+    """{iso3: {kind: delta-encoded ascending ids}} from (iso3, kind, id) postings."""
+    grouped = {}
+    for iso3, kind, id in sorted(postings):
+        grouped.setdefault(iso3, {}).setdefault(kind, []).append(id)
+    return {iso3: {kind: [ids[0]] + [b - a for a, b in zip(ids, ids[1:])] for kind, ids in kinds.items()}
+            for iso3, kinds in grouped.items()}
+
+def build_index(countries: dict[str, dict]) -> dict[str, dict]:
+    """Inverted index: token -> compact postings (see compact)."""
+    postings = defaultdict(set)
+    for iso3, country in countries.items():
+        for proj in country.get("projects", []):
+            if proj.get("id") is None: continue
+            for token in tokenize(f"{proj.get('name', '')} {proj.get('description') or ''}"):
+                postings[token].add((iso3, "p", proj["id"]))
+        for node in walk_framework(country.get("framework") or []):
+            for token in tokenize(f"{node.get('name', '')} {node.get('description') or ''}"):
+                postings[token].add((iso3, "f", node["id"]))
+    return {token: compact(postings[token]) for token in sorted(postings)}
+
+def split(tokens: list[str], sizes: dict[str, int], prefix: str = "") -> dict[str, list[str]]:
+    """Prefix -> tokens. While `prefix`'s tokens exceed SHARD_BYTES, its largest child prefixes
+    (one character longer) are split off into shards of their own; the root is always split."""
+    children = defaultdict(list)
+    for token in tokens:
+        if token != prefix: children[token[:len(prefix) + 1]].append(token)
+    child_bytes = {child: sum(sizes[t] for t in child_tokens) for child, child_tokens in children.items()}
+    rest, shards, split_off = sum(sizes[t] for t in tokens) + 2, {}, set()
+    for child in sorted(children, key=lambda c: (-child_bytes[c], c)):
+        if prefix and rest <= SHARD_BYTES: break
+        shards.update(split(children[child], sizes, child))
+        rest -= child_bytes[child]
+        split_off.add(child)
+    kept = [t for t in tokens if t == prefix or t[:len(prefix) + 1] not in split_off]
+    if prefix and kept: shards[prefix] = kept
+    return shards
+
+def write_shards(index: dict[str, dict]) -> dict:
+    """Write one {token: postings} file per shard plus a small meta file."""
+    encoded = {token: json.dumps(postings, separators=(",", ":")) for token, postings in index.items()}
+    # Bytes of each token's "token":postings, entry in its shard
+    sizes = {token: len(json.dumps(token)) + len(postings) + 2 for token, postings in encoded.items()}
+    shards = split(list(index), sizes)
+
+    SEARCH_DIR.mkdir(exist_ok=True)
+    for f in SEARCH_DIR.glob("*.json"):
+        f.unlink()
+    for prefix, tokens in shards.items():
+        body = ",".join(f"{json.dumps(t)}:{encoded[t]}" for t in tokens)
+        (SEARCH_DIR / f"{prefix}.json").write_text(f"{{{body}}}")
+
+    meta = {"minTokenLength": MIN_TOKEN_LEN, "shardBytes": SHARD_BYTES,
+            "shards": {prefix: len(tokens) for prefix, tokens in sorted(shards.items())}}
+    (OUT / "uninfo-search-index.json").write_text(json.dumps(meta, indent=2))
+    return meta
+
+def run():
+    print("Loading UNINFO country files...")
+    countries = load_countries()
+
+    index = build_index(countries)
+    meta = write_shards(index)
+
+    n_postings = sum(len(ids) for p in index.values() for kinds in p.values() for ids in kinds.values())
+    sizes = [f.stat().st_size for f in SEARCH_DIR.glob("*.json")]
+    print(f"uninfo-search/: {len(index):,} tokens, {n_postings:,} postings from {len(countries)} countries")
+    print(f"  {len(sizes)} shards, {sum(sizes)/1024:.0f} KB total, largest {max(sizes, default=0)/1024:.0f} KB")
+
+if __name__ == "__main__":
+    run()
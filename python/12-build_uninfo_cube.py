@@ -0,0 +1,84 @@
+"""Build agency x SDG x country rollups of UNINFO project funding.
+
+Aggregates required/available/spent from the per-country project lists into a
+cube over (agency, sdg, iso3) and publishes compact slices:
+- uninfo-cube/agencies.json: per agency, its totals and the file with its breakdowns
+- uninfo-cube/agencies/{agency}.json: one agency's totals by SDG and by country
+- uninfo-cube/sdgs.json: per SDG, totals by agency and by country
+- uninfo-cube/global.json: system-wide totals and agency x SDG matrix
+"""
+import json
+import re
+from pathlib import Path
+import pandas as pd
+
+OUT = Path("public/data")
+COUNTRIES_DIR = OUT / "uninfo-countries"
+CUBE_DIR = OUT / "uninfo-cube"
+AGENCIES_DIR = CUBE_DIR / "agencies"
+METRICS = ["required", "available", "spent"]
+
+def load_projects() -> dict[str, list]:
+    """Per-country project lists as written by 10 (build_projects_by_country output)."""
+    return {f.stem: json.loads(f.read_text()).get("projects", []) for f in sorted(COUNTRIES_DIR.glob("*.json"))}
+
+def build_cube(projects_by_country: dict[str, list]) -> pd.DataFrame:
+    rows = [{"agency": p["agency"] or "Unknown", "sdg": str(p["sdg"]) if p["sdg"] else "none", "iso3": iso3,
+             **{m: p[m] for m in METRICS}}
+            for iso3, projects in projects_by_country.items() for p in projects]
+    # Float metrics even without rows, so the sums below stay numeric
+    df = pd.DataFrame(rows, columns=["agency", "sdg", "iso3", *METRICS]).astype({m: float for m in METRICS})
+    return df.groupby(["agency", "sdg", "iso3"], as_index=False)[METRICS].sum()
+
+def rollup(cube: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    return cube.groupby(by)[METRICS].sum().round(2)
+
+def nested(df: pd.DataFrame) -> dict:
+    """{outer: {inner: metrics}} from a two-level rollup."""
+    out = {}
+    for (outer, inner), row in df.iterrows():
+        out.setdefault(outer, {})[inner] = row.to_dict()
+    return out
+
+def slice_by(cube: pd.DataFrame, key: str, other: list[str]) -> dict:
+    """Per `key` value: totals plus one breakdown per other dimension."""
+    totals = rollup(cube, [key])
+    breakdowns = {dim: nested(rollup(cube, [key, dim])) for dim in other}
+    return {k: {"totals": totals.loc[k].to_dict(), **{f"by_{dim}": breakdowns[dim].get(k, {}) for dim in other}}
+            for k in totals.index}
+
+def write(name: str, data: dict):
+    (CUBE_DIR / name).write_text(json.dumps(data, separators=(",", ":")))
+
+def agency_file(agency: str) -> str:
+    return f"agencies/{re.sub(r'[^A-Za-z0-9_-]+', '_', agency)}.json"
+
+def write_agencies(cube: pd.DataFrame):
+    """One file per agency, so an agency view fetches only its own breakdowns, plus a small index."""
+    AGENCIES_DIR.mkdir(exist_ok=True)
+    for f in AGENCIES_DIR.glob("*.json"):
+        f.unlink()
+    index = {}
+    for agency, data in slice_by(cube, "agency", ["sdg", "iso3"]).items():
+        index[agency] = {"totals": data["totals"], "file": agency_file(agency)}
+        write(index[agency]["file"], data)
+    write("agencies.json", index)
+
+def run():
+    print("Loading UNINFO projects...")
+    cube = build_cube(load_projects())
+    CUBE_DIR.mkdir(exist_ok=True)
+
+    write_agencies(cube)
+    write("sdgs.json", slice_by(cube, "sdg", ["agency", "iso3"]))
+    write("global.json", {
+        "totals": cube[METRICS].sum().round(2).to_dict(),
+        "by_agency_sdg": nested(rollup(cube, ["agency", "sdg"])),
+        "by_country": rollup(cube, ["iso3"]).to_dict(orient="index"),
+    })
+
+    print(f"uninfo-cube/: {len(cube):,} cells, {cube['agency'].nunique()} agencies, "
+          f"{cube['sdg'].nunique()} SDGs, {cube['iso3'].nunique()} countries")
+
+if __name__ == "__main__":
+    run()
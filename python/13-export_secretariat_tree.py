@@ -0,0 +1,76 @@
+"""Export UN Secretariat expenses as a precomputed hierarchy per year.
+
+secretariat-tree-{year}.json nests PRIORITY_AREA > PART > SECTION > ENTITY. Every
+node carries its total and its split by source type (Regular assessed, Other
+Assessed, Voluntary), and children are sorted by total. Source type totals are
+summed once per full path; every higher level is a rollup of that table.
+"""
+import argparse
+import json
+from pathlib import Path
+import pandas as pd
+from utils import normalize_entity, parse_years
+
+SOURCE = Path("data/un-secretariat-expenses.csv")
+OUT = Path("public/data")
+# Hierarchy levels, outermost first: (id column, description column)
+LEVELS = [("priority_area", None), ("part", "part_name"), ("section", "section_name"), ("entity", None)]
+# Stands in for missing ids and source types, which groupby would otherwise drop with their amounts
+UNSPECIFIED = "Unspecified"
+
+def load() -> pd.DataFrame:
+    df = pd.read_csv(SOURCE, dtype={"PART_ID": str, "SECTION_ID": str})
+    df.columns = df.columns.str.lower()
+    df = df.rename(columns={"part_id": "part", "part_description": "part_name", "section_id": "section",
+                            "section_description": "section_name", "source_type": "source"})
+    df["entity"] = df["entity"].map(normalize_entity)
+    keys = [level for level, _ in LEVELS] + ["source"]
+    df[keys] = df[keys].fillna(UNSPECIFIED)
+    return df
+
+def path_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Amounts per year and full hierarchy path, one column per source type plus total."""
+    keys = ["year", *(level for level, _ in LEVELS)]
+    table = df.groupby(keys + ["source"])["amount"].sum().unstack("source", fill_value=0)
+    table["total"] = table.sum(axis=1)
+    return table
+
+def node(row: pd.Series, **fields) -> dict:
+    """Node with the given identifying fields (None values omitted), total and non-zero source amounts."""
+    values = row.to_dict()
+    total = values.pop("total")
+    return {**{k: v for k, v in fields.items() if v is not None}, "total": total,
+            "sources": {s: v for s, v in values.items() if v}}
+
+def build_trees(df: pd.DataFrame) -> dict[int, dict]:
+    """Year -> root node with nested children for every hierarchy level."""
+    table = path_totals(df)
+    # Descriptions can change between years (e.g. renamed departments): name per year and id
+    names = {level: df.groupby(["year", level])[col].first() for level, col in LEVELS if col}
+
+    trees = {int(year): node(row, year=int(year)) for year, row in table.groupby(level="year").sum().iterrows()}
+    parents = {(year,): tree for year, tree in trees.items()}
+    for depth in range(1, len(LEVELS) + 1):
+        level, _ = LEVELS[depth - 1]
+        rollup = table.groupby(level=list(range(depth + 1))).sum().sort_values("total", ascending=False, kind="stable")
+        for path, row in rollup.iterrows():
+            name = names[level].get((path[0], path[-1])) if level in names else None
+            child = node(row, id=path[-1], name=name)
+            parents[path[:-1]].setdefault("children", []).append(child)
+            parents[path] = child
+    return trees
+
+def run(years: list[int] | None = None):
+    print("Loading secretariat expenses...")
+    df = load()
+    if years: df = df[df["year"].isin(years)]
+    for year, tree in build_trees(df).items():
+        path = OUT / f"secretariat-tree-{year}.json"
+        path.write_text(json.dumps(tree, separators=(",", ":")))
+        n_entities = sum(len(s.get("children", [])) for a in tree["children"] for p in a["children"] for s in p["children"])
+        print(f"{path.name}: ${tree['total']/1e9:.2f}B, {len(tree['children'])} priority areas, {n_entities} entities")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=parse_years, help="only rebuild these years, e.g. 2024 or 2022-2024")
+    run(parser.parse_args().years)
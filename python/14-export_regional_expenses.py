@@ -0,0 +1,76 @@
+"""Export region-level expense aggregates and a shared, quantized country centroid table.
+
+region-expenses-{year}.json maps each CEB region to its total, its split by entity
+and its countries' totals (keyed by ISO3), so regional views need no client-side
+sums. Country names, regions and coordinates are written once to country-centroids.json
+(country-expenses-{year}.json only carries ISO3 codes and amounts), with lat/long
+stored as integers in units of 1/CENTROID_SCALE degrees.
+"""
+import argparse
+import json
+from pathlib import Path
+import pandas as pd
+from store import load_country_expenses, query
+from utils import COUNTRY_CENTROIDS, country_converter, get_iso3, parse_years
+
+OUT = Path("public/data")
+# 1/100 degree is about 1 km, well below what a world map can show
+CENTROID_SCALE = 100
+
+def mapped(country: pd.DataFrame) -> pd.DataFrame:
+    """Rows of countries with a centroid, the same set country-expenses-{year}.json shows."""
+    df = country[country["iso3"].isin(COUNTRY_CENTROIDS.keys())]
+    return df.assign(region=df["region"].astype(object).fillna("Unknown"))
+
+def country_regions() -> dict[str, str]:
+    """ISO3 -> the CEB region its country rows most often carry, over all years."""
+    df = query("SELECT country, region, COUNT(*) AS n FROM ceb_expenses_by_country_region_sub_agency "
+               "WHERE location_type = 'COU' AND region IS NOT NULL GROUP BY country, region")
+    df["iso3"] = df["country"].map(get_iso3)
+    df = df.dropna(subset="iso3").sort_values(["n", "region"], ascending=[False, True], kind="stable")
+    return df.drop_duplicates("iso3").set_index("iso3")["region"].to_dict()
+
+def export_centroids():
+    codes = sorted(COUNTRY_CENTROIDS)
+    names = country_converter().convert(codes, to="name_short", not_found=None)
+    regions = country_regions()
+    countries = {}
+    for iso3, name in zip(codes, names):
+        lat, long = COUNTRY_CENTROIDS[iso3]
+        countries[iso3] = {"name": name or iso3, "region": regions.get(iso3, "Unknown"),
+                           "lat": round(lat * CENTROID_SCALE), "long": round(long * CENTROID_SCALE)}
+    with open(OUT / "country-centroids.json", "w") as f:
+        json.dump({"scale": CENTROID_SCALE, "countries": countries}, f, separators=(",", ":"))
+    print(f"country-centroids.json: {len(countries)} countries")
+
+def rounded(s: pd.Series) -> dict:
+    return {k: round(v, 2) for k, v in s.sort_values(ascending=False, kind="stable").items()}
+
+def export_regional_expenses(country: pd.DataFrame):
+    df = mapped(country)
+    by_entity = df.groupby(["year", "region", "entity"], observed=True)["amount"].sum()
+    by_country = df.groupby(["year", "region", "iso3"], observed=True)["amount"].sum()
+    totals = df.groupby(["year", "region"], observed=True)["amount"].sum()
+    for year in sorted(df["year"].unique()):
+        regions = totals.loc[year].sort_values(ascending=False, kind="stable")
+        data = {region: {"total": round(total, 2),
+                         "entities": rounded(by_entity.loc[(year, region)]),
+                         "countries": rounded(by_country.loc[(year, region)])}
+                for region, total in regions.items()}
+        with open(OUT / f"region-expenses-{year}.json", "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"region-expenses-{year}.json: {len(data)} regions, ${regions.sum()/1e9:.1f}B")
+
+def run(country_expenses: pd.DataFrame | None = None, years: list[int] | None = None):
+    if country_expenses is None:
+        print("Loading country expenses...")
+        country_expenses = load_country_expenses(years)
+    elif years:
+        country_expenses = country_expenses[country_expenses["year"].isin(years)]
+    export_centroids()
+    export_regional_expenses(country_expenses)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=parse_years, help="only rebuild these years, e.g. 2024 or 2022-2024")
+    run(years=parser.parse_args().years)
@@ -0,0 +1,119 @@
+"""Export derived funding metrics per entity, donor and system group to funding-metrics.json.
+
+The frontend used to derive these from the full donors-* and entity-revenue-* files.
+Here they are computed in a few grouped passes over the fused revenue and expenses
+in the store:
+- revenue: total, plus assessed and earmarked shares of it
+- concentration: Herfindahl index and top-5 share of the donors (for donors, of the
+  entities they fund). "Other X" aggregate rows are left out, as in by_donor
+- growth: change on the previous year, and CAGR between the first and last year with revenue
+- gap (entities and groups): revenue minus expenses
+
+Series are arrays aligned with meta.years, with null where a key has no revenue
+(or no expenses for expenses and gap).
+"""
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from store import query
+from utils import rev_category
+
+OUT = Path("public/data")
+TOP_N = 5
+# Shares and indices are rounded to this many decimals, amounts to cents
+SHARE_DECIMALS = 4
+
+def load_revenue() -> pd.DataFrame:
+    df = query("SELECT entity, year, donor_name AS donor, rev_type, amount, is_other FROM revenue")
+    df["is_other"] = df["is_other"].astype(bool)
+    df["category"] = df["rev_type"].map(rev_category)
+    return df
+
+def load_expenses() -> pd.DataFrame:
+    return query("SELECT entity, year, amount FROM expenses")
+
+def load_groups() -> dict[str, str]:
+    entities = json.loads((OUT / "entities.json").read_text())
+    return {e["entity"]: e.get("system_grouping") or "Other" for e in entities}
+
+def revenue_shares(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """(key, year) -> total revenue and its assessed and earmarked shares (null unless the total is positive)."""
+    by_cat = df.pivot_table(index=[key, "year"], columns="category", values="amount", aggfunc="sum", fill_value=0)
+    total = by_cat.sum(axis=1)
+    base = total.where(total > 0)
+    return pd.DataFrame({"revenue": total,
+                         "assessed_share": by_cat.get("Assessed", 0) / base,
+                         "earmarked_share": by_cat.get("Voluntary earmarked", 0) / base})
+
+def concentration(df: pd.DataFrame, key: str, counterpart: str) -> pd.DataFrame:
+    """(key, year) -> Herfindahl index and top-N share of `counterpart` amounts."""
+    amounts = df[~df["is_other"]].groupby([key, "year", counterpart], observed=True)["amount"].sum().clip(lower=0)
+    totals = amounts.groupby(level=[0, 1]).transform("sum")
+    shares = (amounts / totals).dropna()
+    top = shares.sort_values(ascending=False).groupby(level=[0, 1]).head(TOP_N)
+    return pd.DataFrame({"hhi": (shares ** 2).groupby(level=[0, 1]).sum(),
+                         f"top{TOP_N}_share": top.groupby(level=[0, 1]).sum()})
+
+def cagr(wide: pd.DataFrame) -> pd.Series:
+    """Compound annual growth between each row's first and last year with positive revenue."""
+    values = wide.to_numpy(dtype=float)
+    positive = np.nan_to_num(values) > 0
+    first = positive.argmax(axis=1)
+    last = values.shape[1] - 1 - positive[:, ::-1].argmax(axis=1)
+    years = wide.columns.to_numpy()
+    rows = np.arange(len(values))
+    span = years[last] - years[first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = (values[rows, last] / values[rows, first]) ** (1 / span) - 1
+    return pd.Series(np.where(positive.any(axis=1) & (span > 0), rate, np.nan), index=wide.index)
+
+def metrics_for(revenue: pd.DataFrame, key: str, counterpart: str, expenses: pd.DataFrame | None = None) -> pd.DataFrame:
+    """One row per (key, year) with every metric; expenses add expenses and gap."""
+    metrics = revenue_shares(revenue, key).join(concentration(revenue, key, counterpart))
+    if expenses is not None:
+        spent = expenses.groupby([key, "year"], observed=True)["amount"].sum().rename("expenses")
+        metrics = metrics.join(spent, how="outer")
+        metrics["gap"] = metrics["revenue"] - metrics["expenses"]
+    return metrics
+
+def to_series(metrics: pd.DataFrame, years: list[int]) -> dict[str, dict]:
+    """key -> {"cagr", metric: [value per year]} with rounded values and nulls for gaps."""
+    wide = metrics.unstack("year")
+    revenue = wide["revenue"].reindex(columns=years)
+    growth = revenue.pct_change(axis=1, fill_method=None).replace([np.inf, -np.inf], np.nan)
+    columns = {**{m: wide[m].reindex(columns=years) for m in metrics.columns}, "growth": growth}
+    rates = cagr(revenue)
+    out = {}
+    for key in wide.index:
+        item = {"cagr": rates[key]}
+        for name, frame in columns.items():
+            item[name] = frame.loc[key].tolist()
+        out[key] = {k: rounded(k, v) for k, v in item.items()}
+    return out
+
+def rounded(name: str, value):
+    decimals = 2 if name in ("revenue", "expenses", "gap") else SHARE_DECIMALS
+    if isinstance(value, list): return [rounded(name, v) for v in value]
+    # Non-finite values (e.g. from refunds exceeding contributions) would be written as NaN/Infinity
+    return round(float(value), decimals) if pd.notna(value) and np.isfinite(value) else None
+
+def run():
+    revenue, expenses, groups = load_revenue(), load_expenses(), load_groups()
+    years = sorted({int(y) for y in revenue["year"].unique()} | {int(y) for y in expenses["year"].unique()})
+    revenue["group"] = revenue["entity"].map(groups).fillna("Other")
+    expenses["group"] = expenses["entity"].map(groups).fillna("Other")
+
+    output = {
+        "meta": {"years": years, "topN": TOP_N},
+        "entities": to_series(metrics_for(revenue, "entity", "donor", expenses), years),
+        "donors": to_series(metrics_for(revenue, "donor", "entity"), years),
+        "groups": to_series(metrics_for(revenue, "group", "donor", expenses), years),
+    }
+    path = OUT / "funding-metrics.json"
+    path.write_text(json.dumps(output, separators=(",", ":")))
+    print(f"{path.name}: {len(output['entities'])} entities, {len(output['donors'])} donors, "
+          f"{len(output['groups'])} groups, {path.stat().st_size/1e3:.0f} KB")
+
+if __name__ == "__main__":
+    run()
@@ -1,41 +1,119 @@
-"""Generate data manifest with available years for each dataset."""
+"""Generate data manifest with available years and file metadata for each dataset.
+
+Every file entry lists its byte size, gzip size, SHA-256 content hash, record
+count (list length or number of top-level keys) and the dataset's schema version,
+so the frontend can preload, size and cache files precisely.
+"""
+import gzip
+import hashlib
 import json
+import re
 from pathlib import Path
 
 OUT = Path("public/data")
+FUSED = Path("data/ceb/fused")
 
-def detect_years(pattern: str) -> list[int]:
-    """Find all years available for a given file pattern."""
-    files = sorted(OUT.glob(f"{pattern}-*.json"))
-    return [int(f.stem.split("-")[-1]) for f in files]
+# Year-partitioned datasets: manifest key -> (file prefix, default year)
+YEARLY = {
+    "donors": ("donors", "latest"),
+    "entityRevenue": ("entity-revenue", "latest"),
+    "entityRevenueDonors": ("entity-revenue-donors", "latest"),
+    "entitySpending": ("entity-spending", 2023),
+    "countryExpenses": ("country-expenses", "latest"),
+    "countryExpensesEntities": ("country-expenses-entities", "latest"),
+    "sdgExpenses": ("sdg-expenses", "latest"),
+    "secretariatTree": ("secretariat-tree", "latest"),
+    "regionExpenses": ("region-expenses", "latest"),
+}
+# Other datasets: manifest key -> file globs
+STATIC = {
+    "entities": ["entities.json"],
+    "contributorTrends": ["contributor-trends.json"],
+    "contributorTrendsSparse": ["contributor-trends-sparse.json"],
+    "entityTrends": ["entity-trends.json"],
+    "entityTrendsSparse": ["entity-trends-sparse.json"],
+    "uninfoCountries": ["uninfo-countries-index.json", "uninfo-countries/*.json"],
+    "uninfoSdgs": ["uninfo-sdgs.json"],
+    "uninfoSearch": ["uninfo-search-index.json", "uninfo-search/*.json"],
+    "uninfoCube": ["uninfo-cube/*.json", "uninfo-cube/agencies/*.json"],
+    "countryCentroids": ["country-centroids.json"],
+    "sdgExpensesDetail": ["sdg-expenses-detail/*.json"],
+    "fundingMetrics": ["funding-metrics.json"],
+}
+# Bump a dataset's version when its JSON structure changes
+SCHEMA_VERSIONS = {key: 1 for key in [*YEARLY, *STATIC]}
+SCHEMA_VERSIONS.update(
+    countryExpenses=2, countryCentroids=2,  # names, regions and coordinates moved to countryCentroids
+    uninfoCube=2,  # agencies.json is an index of per-agency files
+    uninfoSearch=2,  # size-bounded shards, postings grouped by country and delta-encoded
+)
+# UNINFO finance data is fetched for a single year (see 08-fetch_uninfo.py)
+UNINFO_YEARS = [2024]
 
-def generate_manifest():
-    # Years with secretariat sub-entity breakdown (fused with CEB)
-    FUSION_YEARS = [2019, 2020, 2021, 2022, 2023]
-    
-    manifest = {
-        "donors": {"years": detect_years("donors"), "default": "latest"},
-        "entityRevenue": {"years": detect_years("entity-revenue"), "default": "latest"},
-        "entitySpending": {"years": detect_years("entity-spending"), "default": 2023, "fusionYears": FUSION_YEARS},
-        "countryExpenses": {"years": detect_years("country-expenses"), "default": "latest"},
-        "sdgExpenses": {"years": detect_years("sdg-expenses"), "default": "latest"},
+def detect_years(prefix: str) -> list[int]:
+    """Find all years available for a given file prefix."""
+    pattern = re.compile(rf"^{re.escape(prefix)}-(\d{{4}})\.json$")
+    return sorted(int(m.group(1)) for f in OUT.glob(f"{prefix}-*.json") if (m := pattern.match(f.name)))
+
+def file_info(path: Path, schema_version: int) -> dict:
+    content = path.read_bytes()
+    data = json.loads(content)
+    return {
+        "bytes": len(content),
+        "gzipBytes": len(gzip.compress(content, mtime=0)),
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "records": len(data) if isinstance(data, (list, dict)) else 1,
+        "schemaVersion": schema_version,
     }
-    
-    # Add min/max for convenience
-    for key, val in manifest.items():
-        if val["years"]:
-            val["min"] = min(val["years"])
-            val["max"] = max(val["years"])
-            if val["default"] == "latest":
-                val["default"] = val["max"]
-    
+
+def fusion_years() -> list[int]:
+    """Years with secretariat sub-entity breakdown, as recorded by 06-fuse_ceb_expenses.py."""
+    meta = FUSED / "expenses_meta.json"
+    return json.loads(meta.read_text())["fusionYears"] if meta.exists() else []
+
+def year_range(years: list[int], default) -> dict:
+    val = {"years": years, "default": default}
+    if years:
+        val["min"], val["max"] = min(years), max(years)
+        if default == "latest":
+            val["default"] = val["max"]
+    return val
+
+def generate_manifest():
+    manifest = {}
+    for key, (prefix, default) in YEARLY.items():
+        years = detect_years(prefix)
+        if not years: continue  # not exported (e.g. the --top-k detail files), so not listed
+        manifest[key] = year_range(years, default)
+        manifest[key]["files"] = {f"{prefix}-{y}.json": file_info(OUT / f"{prefix}-{y}.json", SCHEMA_VERSIONS[key])
+                                  for y in years}
+    if "entitySpending" in manifest: manifest["entitySpending"]["fusionYears"] = fusion_years()
+
+    manifest["uninfoCountries"] = year_range(UNINFO_YEARS, "latest")
+    manifest["uninfoSdgs"] = year_range(UNINFO_YEARS, "latest")
+    manifest["uninfoProjects"] = {"available": (OUT / "uninfo-countries").is_dir()}
+
+    for key, patterns in STATIC.items():
+        files = [f for pattern in patterns for f in sorted(OUT.glob(pattern))]
+        if files:
+            manifest.setdefault(key, {})["files"] = {str(f.relative_to(OUT)): file_info(f, SCHEMA_VERSIONS[key])
+                                                     for f in files}
+
     out_path = OUT / "manifest.json"
     out_path.write_text(json.dumps(manifest, indent=2))
-    
+
     print("Generated manifest.json:")
     for key, val in manifest.items():
-        fusion = f", fusion: {val['fusionYears']}" if 'fusionYears' in val else ""
-        print(f"  {key}: {val['min']}-{val['max']} (default: {val['default']}{fusion})")
+        files = val.get("files", {})
+        size = f", {len(files)} files, {sum(f['bytes'] for f in files.values())/1e6:.1f} MB" if files else ""
+        if val.get("years"):
+            fusion = f", fusion: {val['fusionYears']}" if 'fusionYears' in val else ""
+            print(f"  {key}: {val['min']}-{val['max']} (default: {val['default']}{fusion}){size}")
+        else:
+            print(f"  {key}{size}")
 
-if __name__ == "__main__":
+def run():
     generate_manifest()
+
+if __name__ == "__main__":
+    run()
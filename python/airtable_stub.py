@@ -0,0 +1,67 @@
+"""Minimal local stand-in for the Airtable list-records API, to run 01 offline.
+
+    python python/airtable_stub.py records.json [--port 8787]
+    AIRTABLE_ENDPOINT_URL=http://localhost:8787 AIRTABLE_API_KEY=x AIRTABLE_BASE_ID=app AIRTABLE_TABLE_ID=tbl \\
+        python python/01-fetch_from_airtable.py --sync
+
+records.json is a list of {"id", "lastModified", "fields"} in view order. It is
+re-read on every request, so edits between runs appear as modified, added or
+deleted records. The stub supports fields[], pageSize and offset, and the
+filterByFormula shapes that 01 sends (a LAST_MODIFIED_TIME cursor and
+RECORD_ID() lists), via GET or POST .../listRecords.
+"""
+import argparse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+def matches(record: dict, formula: str | None) -> bool:
+    if not formula: return True
+    if m := re.search(r"IS_AFTER\(LAST_MODIFIED_TIME\(\), DATETIME_PARSE\('([^']+)'\)\)", formula):
+        return record["lastModified"] > m.group(1)
+    if ids := re.findall(r"RECORD_ID\(\)='([^']+)'", formula):
+        return record["id"] in ids
+    raise ValueError(f"Unsupported formula: {formula}")
+
+def list_records(records: list[dict], params: dict) -> dict:
+    """One page of records shaped like Airtable's response."""
+    fields = params.get("fields") or params.get("fields[]")
+    selected = [r for r in records if matches(r, params.get("filterByFormula"))]
+    start, size = int(params.get("offset") or 0), int(params.get("pageSize") or 100)
+    page = [{"id": r["id"], "createdTime": r.get("createdTime", r["lastModified"]),
+             "fields": {k: v for k, v in r["fields"].items() if not fields or k in fields}}
+            for r in selected[start:start + size]]
+    return {"records": page, **({"offset": str(start + size)} if start + size < len(selected) else {})}
+
+def make_handler(path: Path):
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self, params: dict):
+            try:
+                body, status = list_records(json.loads(path.read_text()), params), 200
+            except ValueError as e:
+                body, status = {"error": {"type": "INVALID_FILTER_BY_FORMULA", "message": str(e)}}, 422
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            self.respond({k: v if k.startswith("fields") else v[0] for k, v in query.items()})
+
+        def do_POST(self):
+            self.respond(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"))
+
+    return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("records", type=Path)
+    parser.add_argument("--port", type=int, default=8787)
+    args = parser.parse_args()
+    print(f"Serving {args.records} on http://localhost:{args.port}")
+    ThreadingHTTPServer(("localhost", args.port), make_handler(args.records)).serve_forever()
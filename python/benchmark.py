@@ -0,0 +1,133 @@
+"""Benchmarks for the data pipeline.
+
+    python python/benchmark.py startup [--repeat N]
+    python python/benchmark.py serve [--requests N] [--threads T] [--cache-size C]
+
+`startup` imports each stage (and utils and pipeline) in a fresh interpreter and
+reports the import time (best of N, excluding interpreter startup) and which heavy
+dependencies were loaded as a side effect. Stages built on pandas (and store.py,
+which 05, 07, 09 and 15 query) import it at module level, since every path through
+them needs it; pipeline.py only imports a stage when it runs, so that cost is paid
+once and only for such stages. The LEAN modules never need a heavy dependency just
+to be imported: if one does, it is flagged and the command exits with status 1.
+
+`serve` starts the query service (serve.py) on a free local port. It sends N slice
+requests from T keep-alive clients and reports throughput, latency percentiles and
+the cache hit rate. Requests are drawn with a skew towards the largest donors,
+entities and countries, like real browsing.
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).parent
+HEAVY = ["pandas", "numpy", "country_converter", "joblib", "requests"]
+# Modules that must import without any HEAVY module (their heavy imports are deferred)
+LEAN = ["utils", "pipeline", "02-fetch_ceb_data", "10-export_uninfo_json", "11-build_uninfo_search_index",
+        "99-generate_manifest"]
+
+PROBE = """
+import importlib, json, sys, time
+sys.path.insert(0, {path!r})
+t = time.perf_counter()
+try:
+    importlib.import_module({module!r})
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+print(json.dumps({{"seconds": time.perf_counter() - t, "error": error,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def stages() -> list[str]:
+    return sorted(f.stem for f in PYTHON_DIR.glob("[0-9][0-9]-*.py"))
+
+def time_import(module: str, repeat: int) -> dict:
+    """Best-of-`repeat` time to import `module` in a fresh interpreter."""
+    code = PROBE.format(path=str(PYTHON_DIR.resolve()), module=module, heavy=HEAVY)
+    runs = []
+    for _ in range(repeat):
+        res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        runs.append(json.loads(res.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+def startup(repeat: int = 3) -> bool:
+    """Print import times; False if a LEAN module loaded a heavy dependency."""
+    print(f"{'stage':<34} {'import':>8}  heavy modules loaded")
+    ok = True
+    for module in ["utils", "pipeline", *stages()]:
+        r = time_import(module, repeat)
+        status = f"  ({r['error']})" if r["error"] else ""
+        if module in LEAN and r["loaded"]:
+            status += "  <- should not load heavy modules"
+            ok = False
+        print(f"{module:<34} {r['seconds']*1000:>6.0f}ms  {', '.join(r['loaded']) or '-'}{status}")
+    return ok
+
+def slice_urls() -> list[str]:
+    """Request mix over the store's largest donors, entities and countries, most popular first."""
+    from store import query
+    donors = query("SELECT donor_name FROM revenue GROUP BY 1 ORDER BY SUM(amount) DESC LIMIT 20")["donor_name"]
+    entities = query("SELECT entity FROM revenue GROUP BY 1 ORDER BY SUM(amount) DESC LIMIT 10")["entity"]
+    countries = query("SELECT country FROM uninfo_projects GROUP BY 1 ORDER BY SUM(spent) DESC LIMIT 20")["country"]
+    urls = [f"/revenue?donor={d}&entity={e}&by=year" for d in donors for e in entities]
+    urls += [f"/revenue?donor={d}&years=2020-2024&by=entity" for d in donors]
+    urls += [f"/projects?country={c}&by=agency,sdg" for c in countries]
+    urls += [f"/country-sdgs?country={c}&by=sdg" for c in countries]
+    return [u.replace(" ", "%20") for u in urls]
+
+def serve_load(requests: int, threads: int, cache_size: int):
+    import http.client
+    from serve import serve
+    server = serve(0, cache_size, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = slice_urls()
+    # Zipf-like popularity: the i-th slice is requested with weight 1/(i+1)
+    picks = random.Random(0).choices(urls, weights=[1 / (i + 1) for i in range(len(urls))], k=requests)
+    latencies, counts, lock = [], {"hits": 0, "errors": 0}, threading.Lock()
+
+    def client(batch: list[str]):
+        con = http.client.HTTPConnection("localhost", server.server_port)
+        for url in batch:
+            t = time.perf_counter()
+            con.request("GET", url, headers={"Accept-Encoding": "gzip"})
+            res = con.getresponse()
+            res.read()
+            with lock:
+                latencies.append(time.perf_counter() - t)
+                counts["hits"] += res.getheader("X-Cache") == "hit"
+                counts["errors"] += res.status != 200
+        con.close()
+
+    t = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(picks[i::threads],)) for i in range(threads)]
+    for w in workers: w.start()
+    for w in workers: w.join()
+    seconds = time.perf_counter() - t
+    server.shutdown()
+
+    latencies.sort()
+    pct = {p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 for p in (50, 95, 99)}
+    print(f"{requests} requests over {len(urls)} slices, {threads} clients, cache size {cache_size}")
+    print(f"  {requests / seconds:.0f} req/s, p50 {pct[50]:.1f}ms, p95 {pct[95]:.1f}ms, p99 {pct[99]:.1f}ms, "
+          f"{counts['hits'] / requests:.0%} cache hits, {counts['errors']} errors")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("startup", help="time importing each stage")
+    p.add_argument("--repeat", type=int, default=3)
+    p = sub.add_parser("serve", help="load-test the local query service")
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--cache-size", type=int, default=512)
+    args = parser.parse_args()
+    if args.command == "startup":
+        sys.exit(0 if startup(args.repeat) else 1)
+    else:
+        serve_load(args.requests, args.threads, args.cache_size)
@@ -0,0 +1,152 @@
+"""Declarative data-quality checks for pipeline datasets.
+
+Checks are declared once per stage and evaluated with grouped, vectorized pandas
+operations. Group totals are computed once per (dataset, keys) and shared across
+checks, and every check runs even if an earlier one fails, so a stage gets one
+report covering all problems instead of stopping at the first assert.
+"""
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+@dataclass
+class Check:
+    name: str
+    dataset: str
+    # Returns the violating rows/groups (empty frame = pass)
+    evaluate: Callable[["Context"], pd.DataFrame]
+    level: str = "error"  # "error" fails the stage, "warning" is reported only
+
+class Context:
+    """Datasets under validation with memoized group totals."""
+    def __init__(self, frames: dict[str, pd.DataFrame]):
+        self.frames = frames
+        self._totals = {}
+
+    def totals(self, dataset: str, by: str | list[str], value: str = "amount") -> pd.Series:
+        key = (dataset, tuple([by] if isinstance(by, str) else by), value)
+        if key not in self._totals:
+            self._totals[key] = self.frames[dataset].groupby(by, observed=True)[value].sum()
+        return self._totals[key]
+
+@dataclass
+class Report:
+    results: list[dict] = field(default_factory=list)
+
+    @property
+    def errors(self) -> list[dict]:
+        return [r for r in self.results if not r["passed"] and r["level"] == "error"]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([{k: v for k, v in r.items() if k != "failures"} for r in self.results])
+
+    def print(self):
+        for r in self.results:
+            mark = "✓" if r["passed"] else ("✗" if r["level"] == "error" else "⚠")
+            detail = f": {r['n_failures']} failing, e.g. {r['failures'][:3]}" if not r["passed"] else ""
+            print(f"{mark} [{r['dataset']}] {r['check']}{detail}")
+        warnings = sum(not r["passed"] and r["level"] == "warning" for r in self.results)
+        passed = len(self.results) - len(self.errors) - warnings
+        print(f"\n{passed}/{len(self.results)} checks passed, {warnings} warnings, {len(self.errors)} errors")
+
+    def raise_on_error(self):
+        if not self.ok:
+            raise ValidationError(self)
+
+class ValidationError(Exception):
+    def __init__(self, report: Report):
+        self.report = report
+        super().__init__("; ".join(f"[{r['dataset']}] {r['check']}" for r in report.errors))
+
+def run_checks(frames: dict[str, pd.DataFrame], checks: list[Check]) -> Report:
+    """Evaluate all checks against the given datasets and collect a report."""
+    ctx, report = Context(frames), Report()
+    for check in checks:
+        failing = check.evaluate(ctx)
+        if failing.index.names != [None]: failing = failing.reset_index()
+        report.results.append({
+            "check": check.name, "dataset": check.dataset, "level": check.level,
+            "passed": failing.empty, "n_failures": len(failing),
+            "failures": failing.to_dict(orient="records"),
+        })
+    return report
+
+# --- Check factories ---
+
+def year_coverage(dataset: str, years, col: str = "year", exact: bool = False) -> Check:
+    """All `years` present (and, if exact, no others)."""
+    expected = set(years)
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        actual = set(ctx.frames[dataset][col].unique())
+        missing, extra = expected - actual, (actual - expected) if exact else set()
+        return pd.DataFrame({"year": sorted(missing) + sorted(extra),
+                             "problem": ["missing"] * len(missing) + ["unexpected"] * len(extra)})
+    kind = "exactly" if exact else "at least"
+    return Check(f"covers {kind} {min(expected)}-{max(expected)}", dataset, evaluate)
+
+def unique_keys(dataset: str, keys: list[str]) -> Check:
+    """No duplicate rows per key combination."""
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        counts = ctx.frames[dataset].groupby(keys, observed=True).size().rename("count")
+        return counts[counts > 1].to_frame()
+    return Check(f"unique {'/'.join(keys)}", dataset, evaluate)
+
+def non_negative(dataset: str, keys: list[str], col: str = "amount", level: str = "warning") -> Check:
+    """Values in `col` are >= 0; reported per key combination."""
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        df = ctx.frames[dataset]
+        return df.loc[df[col] < 0, keys + [col]].set_index(keys)
+    return Check(f"non-negative {col}", dataset, evaluate, level)
+
+def total_range(dataset: str, by: str = "year", low: float | None = None, high: float | None = None) -> Check:
+    """Group totals lie within (low, high)."""
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        totals = ctx.totals(dataset, by)
+        bad = pd.Series(False, index=totals.index)
+        if low is not None: bad |= totals <= low
+        if high is not None: bad |= totals >= high
+        return totals[bad].rename("total").to_frame()
+    bounds = " and ".join(s for s in [f"> {low:,.0f}" if low is not None else "", f"< {high:,.0f}" if high is not None else ""] if s)
+    return Check(f"total per {by} {bounds}", dataset, evaluate)
+
+def totals_consistent(datasets: list[str], by: str = "year", decimals: int = -5, groups=None) -> Check:
+    """Group totals agree across datasets after rounding, and are positive."""
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        table = pd.concat({d: ctx.totals(d, by) for d in datasets}, axis=1)
+        if groups is not None: table = table.reindex(list(groups))
+        table = table.fillna(0).round(decimals)
+        bad = (table.nunique(axis=1) > 1) | (table <= 0).any(axis=1)
+        return table[bad]
+    return Check(f"totals per {by} consistent", ", ".join(datasets), evaluate)
+
+def within_tolerance(dataset: str, reference: str, by: str | list[str] = "year", pct: float = 0.5,
+                     overrides: dict | None = None, ref_by: str | list[str] | None = None) -> Check:
+    """Group totals deviate from the reference's by less than `pct` percent (per-group overrides allowed)."""
+    overrides = overrides or {}
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        table = pd.DataFrame({"total": ctx.totals(dataset, by), "reference": ctx.totals(reference, ref_by or by)})
+        table = table.dropna(subset=["total"]).fillna(0)
+        table["diff_pct"] = (table["total"] - table["reference"]).abs() / table["reference"].abs() * 100
+        tolerance = table.index.map(lambda k: overrides.get(k, pct))
+        return table[~(table["diff_pct"] < tolerance)]
+    return Check(f"within {pct}% of {reference} per {by}", dataset, evaluate)
+
+def at_least(dataset: str, reference: str, by: list[str], ref_by: list[str] | None = None) -> Check:
+    """Group totals are not below the reference's totals for the same groups."""
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        ref = ctx.totals(reference, ref_by or by)
+        table = pd.DataFrame({"total": ctx.totals(dataset, by).reindex(ref.index, fill_value=0), "reference": ref})
+        return table[table["total"] < table["reference"]]
+    return Check(f"not below {reference} per {'/'.join(by)}", dataset, evaluate)
+
+def expect(dataset: str, name: str, violations: Callable[[pd.DataFrame], pd.Series], level: str = "error") -> Check:
+    """Row-level rule: `violations(df)` returns a boolean mask of offending rows."""
+    def evaluate(ctx: Context) -> pd.DataFrame:
+        df = ctx.frames[dataset]
+        return df[violations(df)]
+    return Check(name, dataset, evaluate, level)
@@ -0,0 +1,158 @@
+"""Golden-output equivalence check between a reference revision and the working tree.
+
+    python python/golden.py [--ref HEAD] [--stages 03,05,06,07,09,10] [--rel-tol 1e-9] [--allow-skip]
+
+The reference version of python/ is exported from git and runs next to the
+working-tree version, each in its own scratch copy of data/ and public/data.
+Every stage runs as a script on identical inputs, fully offline. Then every file
+that either version wrote is compared structurally:
+- JSON is compared as values, so dict key order doesn't matter.
+- CSV is compared cell by cell.
+- Numbers are compared with a relative/absolute tolerance.
+Each stage reports the wall time of both versions and the speedup. A stage that
+fails in both versions (e.g. missing inputs) is "skipped", which fails the check
+unless --allow-skip is given.
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STAGES = {
+    "03": "03-fuse_ceb_revenue.py",
+    "05": "05-export_contributor_json.py",
+    "06": "06-fuse_ceb_expenses.py",
+    "07": "07-export_expenses_json.py",
+    "09": "09-process_entity_trends.py",
+    "10": "10-export_uninfo_json.py",
+}
+# Directories copied into each sandbox; outputs are any files the stages write there
+SANDBOX_DIRS = ["data", "public/data"]
+# Incremental-build caches that would let a version skip work (not copied or compared)
+CACHES = ["export_hashes.json", "store.sqlite", "store.sqlite-journal", "store.sqlite-wal", "store.sqlite-shm"]
+MAX_REPORTED = 5
+
+def export_ref(ref: str, dest: Path) -> Path:
+    """Extract python/ at `ref` into dest."""
+    archive = subprocess.run(["git", "archive", ref, "python"], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest, filter="data")
+    return dest / "python"
+
+def make_sandbox(dest: Path) -> Path:
+    for d in SANDBOX_DIRS:
+        shutil.copytree(ROOT / d, dest / d, ignore=shutil.ignore_patterns(*CACHES))
+    return dest
+
+def snapshot(sandbox: Path) -> dict[str, tuple]:
+    return {str(f.relative_to(sandbox)): (f.stat().st_mtime_ns, f.stat().st_size)
+            for d in SANDBOX_DIRS for f in (sandbox / d).rglob("*") if f.is_file() and f.name not in CACHES}
+
+def run_stage(python_dir: Path, script: str, sandbox: Path) -> tuple[float, str | None, set[str]]:
+    """Run one stage script in `sandbox`; returns (seconds, error, files written)."""
+    before = snapshot(sandbox)
+    t = time.perf_counter()
+    res = subprocess.run([sys.executable, str(python_dir / script)], cwd=sandbox, capture_output=True, text=True)
+    seconds = time.perf_counter() - t
+    error = (res.stderr.strip().splitlines() or ["failed"])[-1] if res.returncode else None
+    after = snapshot(sandbox)
+    return seconds, error, {f for f, stat in after.items() if before.get(f) != stat}
+
+# --- Structural comparison ---
+
+def diff_values(a, b, path: str, rel_tol: float, abs_tol: float) -> list[str]:
+    if isinstance(a, dict) and isinstance(b, dict):
+        out = [f"{path}.{k}: only in {'reference' if k in a else 'new'}" for k in sorted(a.keys() ^ b.keys(), key=str)]
+        for k in sorted(a.keys() & b.keys(), key=str):
+            out += diff_values(a[k], b[k], f"{path}.{k}", rel_tol, abs_tol)
+        return out
+    if isinstance(a, list) and isinstance(b, list):
+        out = [f"{path}: length {len(a)} != {len(b)}"] if len(a) != len(b) else []
+        for i, (x, y) in enumerate(zip(a, b)):
+            out += diff_values(x, y, f"{path}[{i}]", rel_tol, abs_tol)
+        return out
+    numbers = (int, float)
+    if isinstance(a, numbers) and isinstance(b, numbers) and not isinstance(a, bool) and not isinstance(b, bool):
+        if math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol) or (math.isnan(a) and math.isnan(b)): return []
+    elif a == b:
+        return []
+    return [f"{path}: {a!r} != {b!r}"]
+
+def csv_cell(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def load(path: Path):
+    if path.suffix == ".json": return json.loads(path.read_text())
+    if path.suffix == ".csv":
+        with open(path, newline="") as f:
+            return [[csv_cell(v) for v in row] for row in csv.reader(f)]
+    return path.read_bytes()
+
+def compare_file(ref: Path, new: Path, rel_tol: float, abs_tol: float) -> list[str]:
+    if not ref.exists() or not new.exists():
+        return [f"only written by {'new' if new.exists() else 'reference'}"]
+    return diff_values(load(ref), load(new), "$", rel_tol, abs_tol)
+
+def main(ref: str, stages: list[str], rel_tol: float, abs_tol: float, keep: bool, allow_skip: bool = False) -> bool:
+    scratch = Path(tempfile.mkdtemp(prefix="golden-"))
+    ref_python = export_ref(ref, scratch / "ref-src")
+    ref_box, new_box = make_sandbox(scratch / "ref"), make_sandbox(scratch / "new")
+    print(f"Reference: {ref}, scratch: {scratch}\n")
+
+    ok, rows = True, []
+    for stage in stages:
+        script = STAGES[stage]
+        ref_time, ref_error, ref_files = run_stage(ref_python, script, ref_box)
+        new_time, new_error, new_files = run_stage(ROOT / "python", script, new_box)
+        files = sorted(ref_files | new_files)
+        diffs = {f: compare_file(ref_box / f, new_box / f, rel_tol, abs_tol) for f in files}
+        diffs = {f: d for f, d in diffs.items() if d}
+
+        if ref_error and new_error: status = "skipped"
+        elif new_error or ref_error: status = "ERROR"
+        else: status = "MISMATCH" if diffs else "ok"
+        ok &= status == "ok" or (status == "skipped" and allow_skip)
+        rows.append((script, status, ref_time, new_time, len(files), len(diffs)))
+
+        print(f"{script}: {status}")
+        for label, error in [("reference", ref_error), ("new", new_error)]:
+            if error: print(f"  {label} failed: {error}")
+        for f, d in list(diffs.items())[:MAX_REPORTED]:
+            print(f"  {f}: {len(d)} differences, e.g. {d[:3]}")
+        if len(diffs) > MAX_REPORTED: print(f"  ... and {len(diffs) - MAX_REPORTED} more files")
+
+    print(f"\n{'stage':<32} {'status':<9} {'ref':>8} {'new':>8} {'speedup':>8} {'files':>6}")
+    for script, status, ref_time, new_time, n_files, _ in rows:
+        speedup = f"{ref_time / new_time:.2f}x" if status != "skipped" else "-"
+        print(f"{script:<32} {status:<9} {ref_time:>7.2f}s {new_time:>7.2f}s {speedup:>8} {n_files:>6}")
+
+    if keep: print(f"\nKept {scratch}")
+    else: shutil.rmtree(scratch)
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", default="HEAD", help="git revision of the reference implementation (default: HEAD)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to compare")
+    parser.add_argument("--rel-tol", type=float, default=1e-9, help="relative tolerance for numbers")
+    parser.add_argument("--abs-tol", type=float, default=1e-6, help="absolute tolerance for numbers")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directories for inspection")
+    parser.add_argument("--allow-skip", action="store_true", help="pass even if stages fail in both versions")
+    args = parser.parse_args()
+
+    stages = [s.strip().zfill(2) for s in args.stages.split(",")]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown: parser.error(f"unknown stage(s): {', '.join(unknown)} (available: {', '.join(STAGES)})")
+    sys.exit(0 if main(args.ref, stages, args.rel_tol, args.abs_tol, args.keep, args.allow_skip) else 1)
@@ -0,0 +1,116 @@
+"""Suggest DONOR_MAPPING entries for unmapped donor name variants.
+
+    python python/match_donors.py [--min-score 0.6] [--top 3]
+
+Builds a character-trigram inverted index over the canonical donor names (the
+targets of DONOR_MAPPING, known donors in utils and member states) plus every
+donor name observed in the CEB donor files. Each observed name that is neither
+canonical nor already mapped is looked up through the index. Only names sharing
+a trigram with it are scored, and very common trigrams are not probed, so the
+cost grows with the number of names rather than with all pairs. Candidates are
+ranked by Dice similarity of trigram sets and written to
+data/ceb/donor_match_candidates.csv for review.
+"""
+import argparse
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import pandas as pd
+from utils import (DONOR_CATEGORY_OVERRIDES, DONOR_MAPPING, GENERIC_DONORS, NON_GOVERNMENT_DONORS,
+                   clean_donor_name, read_ceb_csv)
+
+CLEAN = Path("data/ceb/clean")
+MEMBER_STATES = Path("data/ceb/member_states.csv")
+OUT = Path("data/ceb/donor_match_candidates.csv")
+# Donor files and their donor name column
+SOURCES = {"revenue_government_donors.csv": "government_donor", "revenue_non_gov_donors.csv": "donor"}
+# Trigrams in more than this share of all names (e.g. " un", "ion") are skipped when probing
+MAX_POSTINGS_SHARE = 0.05
+STOPWORDS = {"the", "of", "and", "for"}
+
+def normalize(name: str) -> str:
+    """Lowercased, accent- and punctuation-free name without filler words."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    return " ".join(t for t in re.findall(r"[a-z0-9]+", name) if t not in STOPWORDS)
+
+def trigrams(name: str) -> set[str]:
+    padded = f"  {normalize(name)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    def __init__(self, names: list[str]):
+        self.names = names
+        self.grams = [trigrams(n) for n in names]
+        self.postings = defaultdict(list)
+        for i, grams in enumerate(self.grams):
+            for g in grams:
+                self.postings[g].append(i)
+        self.max_postings = max(50, int(len(names) * MAX_POSTINGS_SHARE))
+
+    def query(self, name: str, top: int = 3, min_score: float = 0.6) -> list[tuple[str, float]]:
+        """Most similar other names by Dice coefficient of trigram sets."""
+        grams = trigrams(name)
+        shared, skipped = Counter(), 0
+        for g in grams:
+            ids = self.postings.get(g, ())
+            if len(ids) <= self.max_postings: shared.update(ids)
+            else: skipped += 1
+        scored = []
+        for i, n in shared.items():
+            size = len(grams) + len(self.grams[i])
+            # Skipped trigrams may or may not be shared: prune on the upper bound, then score exactly
+            if 2 * (n + skipped) / size < min_score or self.names[i] == name: continue
+            score = 2 * (len(grams & self.grams[i]) if skipped else n) / size
+            if score >= min_score: scored.append((self.names[i], round(score, 3)))
+        return heapq.nlargest(top, scored, key=lambda s: s[1])
+
+def canonical_names() -> set[str]:
+    names = set(DONOR_MAPPING.values()) | GENERIC_DONORS | set(DONOR_CATEGORY_OVERRIDES) | NON_GOVERNMENT_DONORS
+    if MEMBER_STATES.exists():
+        names |= set(pd.read_csv(MEMBER_STATES)["country"].dropna())
+    return names
+
+def observed_names() -> pd.DataFrame:
+    """Donor name (asterisks stripped) -> rows and total amount across the donor files."""
+    frames = []
+    for filename, col in SOURCES.items():
+        if not (CLEAN / filename).exists(): continue
+        df = read_ceb_csv(CLEAN / filename)
+        df = df[df[col].notna()]
+        frames.append(pd.DataFrame({"name": df[col].astype(str).str.replace("*", "").str.strip(),
+                                    "amount": df["amount"]}))
+    if not frames:
+        raise SystemExit(f"No donor files in {CLEAN} (expected {' or '.join(SOURCES)}); run 02-fetch_ceb_data.py first")
+    df = pd.concat(frames, ignore_index=True)
+    return df.groupby("name").agg(rows=("amount", "size"), amount=("amount", "sum"))
+
+def match(min_score: float, top: int) -> pd.DataFrame:
+    canonical = canonical_names()
+    observed = observed_names()
+    unmapped = [n for n in observed.index if clean_donor_name(n) == n and n not in canonical]
+    index = TrigramIndex(sorted(canonical | set(unmapped)))
+
+    rows = []
+    for name in unmapped:
+        for rank, (candidate, score) in enumerate(index.query(name, top, min_score), 1):
+            rows.append({"name": name, "candidate": candidate, "score": score, "rank": rank,
+                         "candidate_is_canonical": candidate in canonical,
+                         "rows": observed.at[name, "rows"], "amount": observed.at[name, "amount"]})
+    print(f"{len(observed)} observed names, {len(unmapped)} unmapped, index of {len(index.names)} names")
+    columns = ["name", "candidate", "score", "rank", "candidate_is_canonical", "rows", "amount"]
+    return pd.DataFrame(rows, columns=columns).sort_values(["score", "amount"], ascending=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-score", type=float, default=0.6, help="minimum Dice similarity (0-1)")
+    parser.add_argument("--top", type=int, default=3, help="candidates per unmapped name")
+    args = parser.parse_args()
+
+    candidates = match(args.min_score, args.top)
+    candidates.to_csv(OUT, index=False)
+    print(f"Wrote {len(candidates)} candidates for {candidates['name'].nunique()} names to {OUT}")
+    for _, row in candidates[candidates["rank"] == 1].head(20).iterrows():
+        print(f"  {row['score']:.2f}  {row['name']!r} -> {row['candidate']!r}")
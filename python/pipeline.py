@@ -0,0 +1,97 @@
+"""Run pipeline stages in a single process.
+
+    python -m pipeline run --stages 03,05,09,99   (from python/)
+    python python/pipeline.py run                 (all processing stages)
+    python python/pipeline.py run --years 2024    (only rebuild one year's partitions)
+    python python/pipeline.py list
+
+Every stage module exposes `run(...)`. Frames returned by a stage (the country
+expenses from 07) are passed in memory to later stages whose `run` takes an
+argument of the same name (14), instead of being re-read. The fused revenue and
+expenses are not handed over this way: 03 and 06 write them to CSV, the "store"
+stage loads them into the SQLite store (store.py), and the exporters 05, 07, 09
+and 15 query it. Fetch scripts (01, 04, 08) need network access or credentials
+and stay standalone.
+"""
+import argparse
+import importlib
+import inspect
+import os
+import sys
+import time
+from pathlib import Path
+
+from utils import TRENDS_FORMATS, parse_years
+
+PYTHON_DIR = Path(__file__).resolve().parent
+ROOT = PYTHON_DIR.parent
+
+# In run order: both fuse stages and the store refresh come before the exporters that query the store
+STAGES = {
+    "02": "02-fetch_ceb_data",
+    "03": "03-fuse_ceb_revenue",
+    "06": "06-fuse_ceb_expenses",
+    "store": "store",
+    "05": "05-export_contributor_json",
+    "07": "07-export_expenses_json",
+    "09": "09-process_entity_trends",
+    "10": "10-export_uninfo_json",
+    "11": "11-build_uninfo_search_index",
+    "12": "12-build_uninfo_cube",
+    "13": "13-export_secretariat_tree",
+    "14": "14-export_regional_expenses",
+    "15": "15-export_funding_metrics",
+    "99": "99-generate_manifest",
+}
+
+def load_stage(stage: str):
+    if str(PYTHON_DIR) not in sys.path: sys.path.insert(0, str(PYTHON_DIR))
+    return importlib.import_module(STAGES[stage])
+
+def parse_stages(spec: str | None) -> list[str]:
+    """Comma-separated stage numbers (or "store"), run in pipeline order."""
+    if not spec: return list(STAGES)
+    stages = [s.strip().zfill(2) for s in spec.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown: raise SystemExit(f"Unknown stage(s): {', '.join(unknown)} (available: {', '.join(STAGES)})")
+    return [s for s in STAGES if s in stages]
+
+def run(stages: list[str], **options) -> dict:
+    """Run stages in order, passing returned frames and matching options to each `run`."""
+    os.chdir(ROOT)
+    frames, timings = {}, {}
+    for stage in stages:
+        print(f"\n=== {STAGES[stage]} ===")
+        t = time.perf_counter()
+        fn = load_stage(stage).run
+        params = inspect.signature(fn).parameters
+        outputs = fn(**{k: v for k, v in {**frames, **options}.items() if k in params})
+        frames.update(outputs or {})
+        timings[stage] = time.perf_counter() - t
+
+    print("\n=== Timings ===")
+    for stage, seconds in timings.items():
+        print(f"  {STAGES[stage]:<32} {seconds:>7.2f}s")
+    print(f"  {'total':<32} {sum(timings.values()):>7.2f}s")
+    return frames
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="run stages in one process")
+    p.add_argument("--stages", help="comma-separated stage numbers, e.g. 03,05,09,99 (default: all)")
+    p.add_argument("--jobs", type=int, default=1, help="worker processes for stages that support it")
+    p.add_argument("--force", action="store_true", help="rebuild outputs even if inputs are unchanged")
+    p.add_argument("--years", type=parse_years, help="only rebuild these years, e.g. 2024 or 2022-2024")
+    p.add_argument("--top-k", type=int, help="truncate donor/entity lists to the top K (full lists in detail files)")
+    p.add_argument("--chunksize", type=int, help="stream CEB sources in chunks of this many rows (bounded memory)")
+    p.add_argument("--trends-format", choices=TRENDS_FORMATS, default="rows", help="encoding of the trends files")
+    sub.add_parser("list", help="list available stages")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for stage, module in STAGES.items():
+            print(f"{stage}  {module}")
+    else:
+        run(parse_stages(args.stages), jobs=args.jobs, force=args.force, years=args.years, top_k=args.top_k,
+            chunksize=args.chunksize, trends_format=args.trends_format)
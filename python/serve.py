@@ -0,0 +1,193 @@
+"""Local HTTP query service over the store (store.py), for slices the pre-built JSON doesn't cover.
+
+    python python/serve.py [--port 8765] [--cache-size 512]
+    curl 'localhost:8765/revenue?donor=Germany&entity=WFP,UNICEF&years=2020-2024&by=entity,year'
+    curl 'localhost:8765/projects?country=Kenya&agency=UNDP&sdg=5&by=sdg'
+    curl 'localhost:8765/'                      (datasets with their filters)
+
+Each dataset in DATASETS whitelists its filter parameters. Filters take comma-separated
+values, and `years` takes the same syntax as --years. With `by` (a comma-separated list
+of filter names, or `year`), the metrics are summed per group, largest first. Without it the
+matching rows are returned, up to `limit` (at most MAX_LIMIT).
+
+Responses are gzip-compressed JSON, built whole in memory and kept in an LRU
+cache keyed by the normalized query and the store build, so a rebuilt store never
+serves stale results. Load-test with `python python/benchmark.py serve`.
+"""
+import argparse
+import gzip
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from store import DB, connect, connection
+from utils import parse_years
+
+# Dataset -> (table, filter parameter -> column, summed metrics)
+DATASETS = {
+    "revenue": ("revenue", {"entity": "entity", "donor": "donor_name", "donor_type": "donor_type",
+                            "rev_type": "rev_type", "years": "year"}, ["amount"]),
+    "expenses": ("expenses", {"entity": "entity", "source": "source", "years": "year"}, ["amount"]),
+    "sdg-expenses": ("ceb_expenses_sdgs", {"entity": "entity", "sdg": "sdg_goal", "target": "sdg_target",
+                                           "years": "year"}, ["amount"]),
+    "country-expenses": ("ceb_expenses_by_country_region_sub_agency", {"entity": "entity", "country": "country",
+                                                                       "region": "region", "years": "year"}, ["amount"]),
+    "secretariat": ("secretariat_expenses", {"entity": "entity", "part": "part_id", "section": "section_id",
+                                             "years": "year"}, ["amount"]),
+    "country-sdgs": ("uninfo_country_sdgs", {"country": "country", "sdg": "sdg"}, ["required", "available", "spent"]),
+    "projects": ("uninfo_projects", {"country": "country", "agency": "agency", "sdg": "sdg"},
+                 ["required", "available", "spent"]),
+}
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 100_000
+CHUNK = 64 * 1024
+# Seconds between checks whether the store's sources changed
+CHECK_INTERVAL = 1.0
+# One shared read connection; sqlite3 calls on it are serialized
+LOCK = threading.Lock()
+STORE_BUILD = {"stamp": None, "checked": 0.0}
+
+class BadRequest(ValueError):
+    pass
+
+class LRUCache:
+    """Thread-safe map of the `size` most recently used responses."""
+    def __init__(self, size: int):
+        self.size, self.items, self.lock = size, OrderedDict(), threading.Lock()
+
+    def get(self, key) -> bytes | None:
+        with self.lock:
+            if key not in self.items: return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value: bytes):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size: self.items.popitem(last=False)
+
+def group_columns(filters: dict[str, str]) -> dict[str, str]:
+    """Group-by name -> column: the filters, with the `years` range filter grouped as `year`."""
+    return {("year" if k == "years" else k): c for k, c in filters.items()}
+
+def normalize(dataset: str, params: dict[str, str]) -> tuple:
+    """Hashable cache key: filters with sorted, de-duplicated values, then `by` and `limit`."""
+    if dataset not in DATASETS: raise BadRequest(f"Unknown dataset {dataset!r} (available: {', '.join(DATASETS)})")
+    _, filters, _ = DATASETS[dataset]
+    unknown = set(params) - set(filters) - {"by", "limit"}
+    if unknown: raise BadRequest(f"Unknown parameter(s) {', '.join(sorted(unknown))} (filters: {', '.join(filters)})")
+    by = tuple(b for b in params.get("by", "").split(",") if b)
+    invalid = set(by) - set(group_columns(filters))
+    if invalid: raise BadRequest(f"Cannot group by {', '.join(sorted(invalid))} (groups: {', '.join(group_columns(filters))})")
+    try:
+        where = tuple((k, tuple(parse_years(v) if k == "years" else sorted({s.strip() for s in v.split(",")})))
+                      for k, v in sorted(params.items()) if k in filters)
+        # SQLite reads a negative LIMIT as no limit
+        limit = min(max(int(params.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return dataset, where, by, limit
+
+def to_sql(dataset: str, where: tuple, by: tuple, limit: int) -> tuple[str, list]:
+    table, filters, metrics = DATASETS[dataset]
+    conditions = [f"{filters[k]} IN ({', '.join('?' * len(values))})" for k, values in where]
+    params = [v for _, values in where for v in values]
+    sql_where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    if not by: return f"SELECT * FROM {table} {sql_where} ORDER BY rowid LIMIT ?", params + [limit]
+    columns = group_columns(filters)
+    groups = ", ".join(f"{columns[b]} AS {b}" for b in by)
+    sums = ", ".join(f"SUM({m}) AS {m}" for m in metrics)
+    return (f"SELECT {groups}, {sums} FROM {table} {sql_where} GROUP BY {', '.join(columns[b] for b in by)} "
+            f"ORDER BY {metrics[0]} DESC LIMIT ?", params + [limit])
+
+def store_build() -> int:
+    """Build stamp of the store, refreshing it first if a source changed (checked every CHECK_INTERVAL)."""
+    with LOCK:
+        if time.monotonic() - STORE_BUILD["checked"] > CHECK_INTERVAL:
+            connect()
+            STORE_BUILD.update(stamp=DB.stat().st_mtime_ns, checked=time.monotonic())
+        return STORE_BUILD["stamp"]
+
+def render(key: tuple) -> bytes:
+    """Gzipped JSON for a normalized query, against the store store_build() last checked."""
+    sql, params = to_sql(*key)
+    with LOCK:
+        cursor = connection().execute(sql, params)
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor]
+    dataset, where, by, _ = key
+    body = {"dataset": dataset, "filters": {k: list(v) for k, v in where}, "by": list(by), "rows": rows}
+    return gzip.compress(json.dumps(body, separators=(",", ":")).encode(), compresslevel=6)
+
+def make_handler(cache: LRUCache):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def send(self, status: int, body: bytes, cache: str):
+            gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+            if not gzipped: body = gzip.decompress(body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if gzipped: self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("X-Cache", cache)
+            self.end_headers()
+            for i in range(0, len(body), CHUNK):
+                self.wfile.write(body[i:i + CHUNK])
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            dataset = url.path.strip("/")
+            if not dataset:
+                index = {name: {"filters": list(filters), "groups": list(group_columns(filters)), "metrics": metrics}
+                         for name, (_, filters, metrics) in DATASETS.items()}
+                return self.send(200, gzip.compress(json.dumps(index).encode()), "-")
+            try:
+                # Keyed by store build too, so results from before a rebuild are never served
+                key = (normalize(dataset, dict(parse_qsl(url.query))), store_build())
+                body = cache.get(key)
+                hit = body is not None
+                if not hit:
+                    body = render(key[0])
+                    cache.put(key, body)
+            except BadRequest as e:
+                status = 404 if dataset not in DATASETS else 400
+                return self.send(status, gzip.compress(json.dumps({"error": str(e)}).encode()), "-")
+            except sqlite3.OperationalError as e:
+                # e.g. the dataset's source file was never fetched, so its table is missing
+                return self.send(404, gzip.compress(json.dumps({"error": str(e)}).encode()), "-")
+            except Exception as e:
+                self.log_error("Error answering %s: %r", self.path, e)
+                return self.send(500, gzip.compress(json.dumps({"error": "internal error"}).encode()), "-")
+            self.send(200, body, "hit" if hit else "miss")
+
+        def log_message(self, format, *args):
+            if not self.server.quiet: super().log_message(format, *args)
+
+    return Handler
+
+def serve(port: int, cache_size: int, quiet: bool = False) -> ThreadingHTTPServer:
+    """Server bound to localhost:`port` (0 picks a free port); call serve_forever() to run it."""
+    connect()
+    server = ThreadingHTTPServer(("localhost", port), make_handler(LRUCache(cache_size)))
+    server.quiet = quiet
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-size", type=int, default=512, help="responses kept in the LRU cache")
+    parser.add_argument("--quiet", action="store_true", help="don't log requests")
+    args = parser.parse_args()
+    server = serve(args.port, args.cache_size, args.quiet)
+    print(f"Serving {DB} on http://localhost:{server.server_port}")
+    server.serve_forever()
@@ -0,0 +1,240 @@
+"""Embedded SQLite store over the pipeline's sources, queried by the exporters.
+
+    python python/store.py build
+    python python/store.py query "SELECT donor_name, SUM(amount) FROM revenue WHERE year = 2023 GROUP BY 1 ORDER BY 2 DESC LIMIT 10"
+    python python/store.py tables
+
+data/store.sqlite has one table per source (see TABLES):
+- the fused revenue and expenses
+- every clean CEB file (ceb_<name>)
+- member states
+- Secretariat expenses
+- UNINFO SDG and project figures per country
+
+Entity names are normalized on load and years are in a `year` column. Tables are
+indexed on (year, entity) and (year, donor), so per-year and per-entity slices are
+index lookups. Rows keep their source order in rowid. Each table is reloaded on
+its own when its source file changes (or dropped when it disappears), and query()
+refreshes the tables its SQL names first, so exporters always read current data and
+only pay for loading the sources they use.
+
+The store is safe to share between processes: a table is loaded into a private
+staging table, then swapped in (with its indexes and store_meta entry) in a single
+BEGIN IMMEDIATE transaction, after re-checking that no other process refreshed it
+meanwhile. In WAL mode, readers see the store from before or after a swap, never
+half of one. With a chunksize (build --chunksize, or the pipeline's --chunksize),
+the fused files are loaded chunk by chunk and the CEB files through
+aggregate_ceb_csv, in bounded memory.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from utils import CEB_SCHEMAS, JsonObjectFile, aggregate_ceb_csv, get_iso3, normalize_entities, read_ceb_csv
+
+DB = Path("data/store.sqlite")
+CEB = Path("data/ceb")
+UNINFO = Path("data/uninfo/raw")
+# Bump when table definitions change, to force a rebuild
+STORE_VERSION = 3
+# Common names for CEB columns across files
+CEB_RENAMES = {"calendar_year": "year", "agency": "entity", "entity_code": "entity", "country/territory": "country"}
+# Donor column of the CEB donor files, indexed together with the year
+CEB_DONOR_COLUMNS = {"revenue_government_donors.csv": "government_donor", "revenue_non_gov_donors.csv": "donor"}
+# Seconds to wait for another process's write to the store
+BUSY_TIMEOUT = 600
+
+def entity_table(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({"entity": "category"})
+    df["entity"] = normalize_entities(df["entity"])
+    return df
+
+def load_fused(path: Path, chunksize: int | None = None):
+    """The fused file, or with `chunksize` an iterator over its chunks."""
+    reader = pd.read_csv(path, float_precision="round_trip", chunksize=chunksize)
+    return entity_table(reader) if chunksize is None else (entity_table(chunk) for chunk in reader)
+
+def load_ceb(path: Path, chunksize: int | None = None) -> pd.DataFrame:
+    df = read_ceb_csv(path) if chunksize is None else aggregate_ceb_csv(path, chunksize)
+    return entity_table(df.rename(columns=CEB_RENAMES))
+
+def load_secretariat(path: Path, chunksize: int | None = None) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype={"PART_ID": str, "SECTION_ID": str})
+    return entity_table(df.rename(columns=str.lower))
+
+def metric_columns(item: dict) -> dict:
+    metrics = {m["metricName"]: m["total"] for m in item.get("metrics", [])}
+    return {"required": metrics.get("Total Required Resources", 0), "available": metrics.get("Total Available Resources", 0),
+            "spent": metrics.get("Total Expenditure", 0)}
+
+def load_uninfo_sdgs(path: Path, chunksize: int | None = None) -> pd.DataFrame:
+    rows = [{"country": country, "workspace_id": info.get("workspace_id"), "sdg": sdg.get("id"), **metric_columns(sdg)}
+            for country, info in JsonObjectFile(path).items() for sdg in info.get("sdgs", [])]
+    return pd.DataFrame(rows, columns=["country", "workspace_id", "sdg", "required", "available", "spent"])
+
+def load_uninfo_projects(path: Path, chunksize: int | None = None) -> pd.DataFrame:
+    rows = [{"country": country, "agency": agency.get("abbreviation", ""), "id": proj.get("id"), "code": proj.get("code", ""),
+             "name": proj.get("name", ""), "sdg": proj["sdgs"][0].get("id") if proj.get("sdgs") else None,
+             "start": proj.get("startDate"), "end": proj.get("endDate"), **metric_columns(proj)}
+            for country, agencies in JsonObjectFile(path).items() if isinstance(agencies, list)
+            for agency in agencies for proj in agency.get("planEntities", [])]
+    columns = ["country", "agency", "id", "code", "name", "sdg", "start", "end", "required", "available", "spent"]
+    return pd.DataFrame(rows, columns=columns)
+
+# Table -> (source file, loader, indexed column tuples); tables whose source is missing are left out.
+# Loaders take (path, chunksize=None) and return a frame, or with a chunksize possibly an
+# iterable of frames; the small sources are always loaded whole.
+TABLES = {
+    "revenue": (CEB / "fused/revenue_by_contributor.csv", load_fused,
+                [("year", "entity"), ("year", "donor_name"), ("donor_name", "entity")]),
+    "expenses": (CEB / "fused/expenses.csv", load_fused, [("year", "entity")]),
+    **{f"ceb_{Path(name).stem}": (CEB / "clean" / name, load_ceb,
+                                  [("year", "entity"), *[("year", c) for c in [CEB_DONOR_COLUMNS.get(name)] if c]])
+       for name in CEB_SCHEMAS},
+    "member_states": (CEB / "member_states.csv", pd.read_csv, [("country",)]),
+    "secretariat_expenses": (Path("data/un-secretariat-expenses.csv"), load_secretariat, [("year", "entity")]),
+    "uninfo_country_sdgs": (UNINFO / "countries_sdgs.json", load_uninfo_sdgs, [("country",), ("sdg",)]),
+    "uninfo_projects": (UNINFO / "projects_by_country.json", load_uninfo_projects, [("country",), ("agency",)]),
+}
+# Shared connection of this process, see connection()
+CONNECTION = {}
+
+def connection() -> sqlite3.Connection:
+    """The process's shared connection to the store, reopened if the file was removed."""
+    con = CONNECTION.get("con")
+    if con is not None and not DB.exists():
+        con.close()
+        con = None
+    if con is None:
+        DB.parent.mkdir(parents=True, exist_ok=True)
+        con = CONNECTION["con"] = sqlite3.connect(DB, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+        con.commit()
+    return con
+
+def built() -> dict[str, str]:
+    """store_meta: 'version' and, per table, the mtime of the source it was loaded from."""
+    return dict(connection().execute("SELECT key, value FROM store_meta"))
+
+def stamp(source: Path) -> str | None:
+    return str(source.stat().st_mtime_ns) if source.exists() else None
+
+def stale(names: list[str] | None = None) -> list[str]:
+    """Tables (default: all) whose source changed, appeared or disappeared since they were loaded."""
+    meta = built()
+    if meta.get("version") != str(STORE_VERSION): return list(names or TABLES)
+    return [t for t in names or TABLES if meta.get(t) != stamp(TABLES[t][0])]
+
+@contextmanager
+def write_lock(con: sqlite3.Connection):
+    """BEGIN IMMEDIATE ... COMMIT: one writer at a time, rolled back on error."""
+    con.commit()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+
+def reset(con: sqlite3.Connection):
+    """Drop every table if the definitions changed since the store was built (STORE_VERSION)."""
+    with write_lock(con):
+        if built().get("version") == str(STORE_VERSION): return
+        for (table,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'store_meta'").fetchall():
+            con.execute(f'DROP TABLE "{table}"')
+        con.execute("DELETE FROM store_meta")
+        con.execute("INSERT INTO store_meta VALUES ('version', ?)", (str(STORE_VERSION),))
+
+def reload(con: sqlite3.Connection, table: str, force: bool = False, chunksize: int | None = None) -> bool:
+    """Load `table` from its source into a staging table, then swap it in atomically, unless
+    another process loaded the same source meanwhile. Returns whether the table changed."""
+    t = time.perf_counter()
+    source, load, indexes = TABLES[table]
+    loaded, staging, rows, columns = stamp(source), f"{table}__staging_{os.getpid()}", 0, []
+    con.execute(f'DROP TABLE IF EXISTS "{staging}"')
+    if loaded is not None:
+        frames = load(source, chunksize=chunksize)
+        for df in [frames] if isinstance(frames, pd.DataFrame) else frames:
+            df.to_sql(staging, con, index=False, if_exists="append")
+            rows, columns = rows + len(df), list(df.columns)
+    with write_lock(con):
+        if not force and built().get(table) == loaded:
+            con.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            return False
+        con.execute(f'DROP TABLE IF EXISTS "{table}"')
+        con.execute("DELETE FROM store_meta WHERE key = ?", (table,))
+        if loaded is not None:
+            con.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+            for index in indexes:
+                if all(c in columns for c in index):
+                    con.execute(f'CREATE INDEX "{table}_{"_".join(index)}" ON "{table}" ({", ".join(index)})')
+            con.execute("INSERT INTO store_meta VALUES (?, ?)", (table, loaded))
+    if loaded is not None: print(f"Loaded {table} from {source} ({rows} rows) in {time.perf_counter() - t:.2f}s")
+    return True
+
+def refresh(names: list[str] | None = None, force: bool = False, chunksize: int | None = None) -> list[str]:
+    """Reload the stale tables among `names` (default: all), dropping those whose source is gone.
+    Returns the tables that were reloaded or dropped."""
+    con = connection()
+    if built().get("version") != str(STORE_VERSION): reset(con)
+    changed = list(names or TABLES) if force else stale(names)
+    return [table for table in changed if reload(con, table, force, chunksize)]
+
+def connect(*names: str) -> sqlite3.Connection:
+    """Connection to the store, with the named tables (default: all) refreshed first."""
+    refresh(list(names) or None)
+    return connection()
+
+def query(sql: str, params: tuple = ()) -> pd.DataFrame:
+    """Run `sql` after refreshing the store tables it names."""
+    names = [t for t in TABLES if re.search(rf"\b{t}\b", sql)]
+    return pd.read_sql_query(sql, connect(*names) if names else connection(), params=params)
+
+def year_filter(years: list[int] | None, where: str = "") -> tuple[str, tuple]:
+    """WHERE clause (with an optional extra condition) and params selecting `years`, or all years."""
+    conditions = [c for c in [where, years and f"year IN ({', '.join('?' * len(years))})"] if c]
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), tuple(years or ())
+
+def load_country_expenses(years: list[int] | None = None) -> pd.DataFrame:
+    """CEB country-level expenses (location_type COU) in file order, with the ISO3 code of each country."""
+    where, params = year_filter(years, "location_type = 'COU'")
+    df = query(f"SELECT * FROM ceb_expenses_by_country_region_sub_agency {where} ORDER BY rowid", params)
+    # Categorical map converts each distinct country name once
+    df["iso3"] = df["country"].astype("category").map(get_iso3).astype(object)
+    return df[df["iso3"].notna()]
+
+def tables() -> list[str]:
+    names = query("SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'store_meta'")["name"]
+    return [t for t in names if "__staging_" not in t]
+
+def run(force: bool = False, chunksize: int | None = None):
+    changed = refresh(force=force, chunksize=chunksize)
+    print(f"{DB}: {len(changed)} tables refreshed, {len(TABLES) - len(changed)} up to date")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="reload every table from its source")
+    b.add_argument("--chunksize", type=int, help="load the fused and CEB files in chunks of this many rows (bounded memory)")
+    q = sub.add_parser("query", help="run a SQL query and print the result")
+    q.add_argument("sql")
+    sub.add_parser("tables", help="list tables with row counts")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        run(force=True, chunksize=args.chunksize)
+    elif args.command == "query":
+        with pd.option_context("display.max_rows", 200, "display.width", 200):
+            print(query(args.sql))
+    else:
+        con = connect()
+        for table in tables():
+            rows = con.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            print(f"{table:<48} {rows:>8} rows")
@@ -1,3 +1,18 @@
+# pandas and country_converter are imported on first use so that stages and tools
+# that only need the mappings below start without loading them
+from __future__ import annotations
+
+import codecs
+import csv
+import importlib.util
+import json
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
 ENTITY_MAPPING = {
     "UN-HABITAT": "UN-Habitat", "UNHABITAT": "UN-Habitat",
     "UNWOMEN": "UN Women", "UN-Women": "UN Women", "UNWTO": "UN Tourism",
@@ -102,3 +117,337 @@ def parse_amount(amount_str: str | float) -> float:
 
 def normalize_entity(entity: str) -> str:
     return ENTITY_MAPPING.get(entity, entity)
+
+def normalize_entities(s: pd.Series) -> pd.Series:
+    """Normalize an entity column; categoricals map each category once and keep name order."""
+    import pandas as pd
+    s = s.map(normalize_entity)
+    return s.cat.reorder_categories(sorted(s.cat.categories)) if isinstance(s.dtype, pd.CategoricalDtype) else s
+
+# R-code to display category mapping
+REV_CATEGORY = {
+    "R01": "Assessed", "R02A": "Voluntary un-earmarked", "R02B": "Voluntary un-earmarked",
+    "R03A": "Voluntary earmarked", "R03B": "Voluntary earmarked", "R03C": "Voluntary earmarked",
+    "R03D": "Voluntary earmarked", "R03E": "Voluntary earmarked", "R03F": "Voluntary earmarked",
+    "R04A": "Other", "R04B": "Other", "R04C": "Other", "R05": "Other",
+    "R07": "Voluntary earmarked", "R08": "Voluntary un-earmarked", "R08B": "Voluntary un-earmarked",
+    "R09": "Voluntary earmarked", "R10": "Voluntary earmarked", "R11": "Voluntary earmarked", "R12": "Voluntary earmarked",
+}
+
+def rev_category(code: str) -> str:
+    return REV_CATEGORY.get(code, "Voluntary earmarked")
+
+# Declared column dtypes per CEB file (normalized column names); columns not listed are dropped on read
+CEB_SCHEMAS = {
+    "revenue.csv": {
+        "agency": "category", "calendar_year": "int16", "rev_type": "category", "amount": "float64",
+    },
+    "revenue_sub_agency.csv": {
+        "agency": "category", "sub_agency": "category", "calendar_year": "int16", "amount": "float64",
+        "sub_type_name": "category", "rev_type": "category", "sub_type": "category",
+    },
+    "revenue_by_financing_instruments_and_government_contributors.csv": {
+        "entity": "category", "calendar_year": "int16", "rev_type": "category",
+        "government_donor": "category", "amount": "float64",
+    },
+    "revenue_government_donors.csv": {
+        "entity": "category", "calendar_year": "int16", "rev_type": "category",
+        "government_donor": "category", "amount": "float64",
+    },
+    "revenue_non_gov_donors.csv": {
+        "entity": "category", "calendar_year": "int16", "rev_type": "category",
+        "donor": "category", "contrib_type": "category", "amount": "float64",
+    },
+    "revenue_contrib_type.csv": {
+        "entity": "category", "calendar_year": "int16", "rev_type": "category",
+        "contrib_type": "category", "amount": "float64",
+    },
+    "expenses_sub_agency.csv": {
+        "agency": "category", "sub_agency": "category", "calendar_year": "int16", "amount": "float64",
+        "transaction_type": "category",
+    },
+    "expenses_by_country_region_sub_agency.csv": {
+        "agency": "category", "calendar_year": "int16", "country/territory": "category",
+        "location_type": "category", "region": "category", "amount": "float64",
+    },
+    "expenses_sdgs.csv": {
+        "calendar_year": "int16", "entity_code": "category", "type_of_financial_information": "category",
+        "amount": "float64", "sdg_goal": "category", "sdg_target": "category", "sdg_indicator": "category",
+    },
+}
+
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+def normalize_column(name: str) -> str:
+    return name.lstrip("\ufeff").strip().lower().replace(" ", "_").replace("usd_amount", "amount")
+
+def read_ceb_csv(path: Path) -> pd.DataFrame:
+    """Read a raw or clean CEB CSV with its declared schema and normalized column names."""
+    import pandas as pd
+    schema = CEB_SCHEMAS[path.name]
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f))
+    names = {c: normalize_column(c) for c in header if normalize_column(c) in schema}
+    dtype = {c: schema[n] for c, n in names.items()}
+    kwargs = dict(usecols=list(names), engine=CSV_ENGINE, encoding="utf-8-sig", na_values=["-", "N/A", "n/a"])
+    try:
+        df = pd.read_csv(path, dtype=dtype, **kwargs)
+    except ValueError:
+        # Unexpected text in a numeric column: parse amounts as strings and coerce below
+        df = pd.read_csv(path, dtype={c: "str" if t == "float64" else t for c, t in dtype.items()}, **kwargs)
+    df = df.rename(columns=names)
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
+    return df
+
+def aggregate_ceb_csv(path: Path, chunksize: int) -> pd.DataFrame:
+    """read_ceb_csv in bounded memory: streams `chunksize` rows at a time and folds each chunk
+    into amount sums per distinct combination of the other columns (e.g. year, entity, donor,
+    rev_type), so peak memory grows with the number of keys, not with the file size.
+
+    Rows keep the order in which their key first appears; files without repeated keys come
+    out identical to read_ceb_csv."""
+    import pandas as pd
+    schema = CEB_SCHEMAS[path.name]
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f))
+    names = {c: normalize_column(c) for c in header if normalize_column(c) in schema}
+    # Amounts are read as text and coerced per chunk, like read_ceb_csv's fallback
+    dtype = {c: "str" if schema[n] == "float64" else schema[n] for c, n in names.items()}
+    keys = [n for n in names.values() if n != "amount"]
+    chunks = pd.read_csv(path, dtype=dtype, usecols=list(names), chunksize=chunksize, encoding="utf-8-sig",
+                         na_values=["-", "N/A", "n/a"])
+    totals = None
+    for chunk in chunks:
+        chunk = chunk.rename(columns=names)
+        chunk["amount"] = pd.to_numeric(chunk["amount"], errors="coerce").fillna(0.0)
+        # Categories differ between chunks; compare keys as plain values until the end
+        chunk = chunk.astype({k: object for k in keys if schema[k] == "category"})
+        if totals is not None: chunk = pd.concat([totals, chunk], ignore_index=True)
+        totals = chunk.groupby(keys, sort=False, dropna=False)["amount"].sum().reset_index()
+    if totals is None: totals = pd.read_csv(path, dtype=dtype, usecols=list(names), nrows=0).rename(columns=names)
+    return totals[list(names.values())].astype({n: schema[n] for n in names.values()})
+
+@cache
+def country_converter():
+    """Shared coco.CountryConverter, built on first use (it compiles a large regex table)."""
+    import country_converter as coco
+    return coco.CountryConverter()
+
+def get_iso3(country: str) -> str | None:
+    result = country_converter().convert(country, to="ISO3", not_found=None)
+    if isinstance(result, list): return result[0] if result else None
+    return result if result else None
+
+# Country centroids by ISO3
+COUNTRY_CENTROIDS = {
+    "AFG": (33.9391, 67.7100), "ALB": (41.1533, 20.1683), "DZA": (28.0339, 1.6596),
+    "AGO": (-11.2027, 17.8739), "ARG": (-38.4161, -63.6167), "ARM": (40.0691, 45.0382),
+    "AUS": (-25.2744, 133.7751), "AUT": (47.5162, 14.5501), "AZE": (40.1431, 47.5769),
+    "BGD": (23.6850, 90.3563), "BLR": (53.7098, 27.9534), "BEL": (50.8503, 4.3517),
+    "BEN": (9.3077, 2.3158), "BTN": (27.5142, 90.4336), "BOL": (-16.2902, -63.5887),
+    "BIH": (43.9159, 17.6791), "BWA": (-22.3285, 24.6849), "BRA": (-14.2350, -51.9253),
+    "BGR": (42.7339, 25.4858), "BFA": (12.2383, -1.5616), "BDI": (-3.3731, 29.9189),
+    "KHM": (12.5657, 104.9910), "CMR": (7.3697, 12.3547), "CAN": (56.1304, -106.3468),
+    "CAF": (6.6111, 20.9394), "TCD": (15.4542, 18.7322), "CHL": (-35.6751, -71.5430),
+    "CHN": (35.8617, 104.1954), "COL": (4.5709, -74.2973), "COM": (-11.6455, 43.3333),
+    "COG": (-0.2280, 15.8277), "COD": (-4.0383, 21.7587), "CRI": (9.7489, -83.7534),
+    "CIV": (7.5400, -5.5471), "HRV": (45.1000, 15.2000), "CUB": (21.5218, -77.7812),
+    "CYP": (35.1264, 33.4299), "CZE": (49.8175, 15.4730), "DNK": (56.2639, 9.5018),
+    "DJI": (11.8251, 42.5903), "DOM": (18.7357, -70.1627), "ECU": (-1.8312, -78.1834),
+    "EGY": (26.8206, 30.8025), "SLV": (13.7942, -88.8965), "GNQ": (1.6508, 10.2679),
+    "ERI": (15.1794, 39.7823), "EST": (58.5953, 25.0136), "SWZ": (-26.5225, 31.4659),
+    "ETH": (9.1450, 40.4897), "FJI": (-17.7134, 178.0650), "FIN": (61.9241, 25.7482),
+    "FRA": (46.2276, 2.2137), "GAB": (-0.8037, 11.6094), "GMB": (13.4432, -15.3101),
+    "GEO": (42.3154, 43.3569), "DEU": (51.1657, 10.4515), "GHA": (7.9465, -1.0232),
+    "GRC": (39.0742, 21.8243), "GTM": (15.7835, -90.2308), "GIN": (9.9456, -9.6966),
+    "GNB": (11.8037, -15.1804), "GUY": (4.8604, -58.9302), "HTI": (18.9712, -72.2852),
+    "HND": (15.2000, -86.2419), "HUN": (47.1625, 19.5033), "ISL": (64.9631, -19.0208),
+    "IND": (20.5937, 78.9629), "IDN": (-0.7893, 113.9213), "IRN": (32.4279, 53.6880),
+    "IRQ": (33.2232, 43.6793), "IRL": (53.4129, -8.2439), "ISR": (31.0461, 34.8516),
+    "ITA": (41.8719, 12.5674), "JAM": (18.1096, -77.2975), "JPN": (36.2048, 138.2529),
+    "JOR": (30.5852, 36.2384), "KAZ": (48.0196, 66.9237), "KEN": (-0.0236, 37.9062),
+    "KOR": (35.9078, 127.7669), "KWT": (29.3117, 47.4818), "KGZ": (41.2044, 74.7661),
+    "LAO": (19.8563, 102.4955), "LVA": (56.8796, 24.6032), "LBN": (33.8547, 35.8623),
+    "LSO": (-29.6100, 28.2336), "LBR": (6.4281, -9.4295), "LBY": (26.3351, 17.2283),
+    "LTU": (55.1694, 23.8813), "LUX": (49.8153, 6.1296), "MDG": (-18.7669, 46.8691),
+    "MWI": (-13.2543, 34.3015), "MYS": (4.2105, 101.9758), "MDV": (3.2028, 73.2207),
+    "MLI": (17.5707, -3.9962), "MLT": (35.9375, 14.3754), "MRT": (21.0079, -10.9408),
+    "MUS": (-20.3484, 57.5522), "MEX": (23.6345, -102.5528), "MDA": (47.4116, 28.3699),
+    "MNG": (46.8625, 103.8467), "MNE": (42.7087, 19.3744), "MAR": (31.7917, -7.0926),
+    "MOZ": (-18.6657, 35.5296), "MMR": (21.9162, 95.9560), "NAM": (-22.9576, 18.4904),
+    "NPL": (28.3949, 84.1240), "NLD": (52.1326, 5.2913), "NZL": (-40.9006, 174.8860),
+    "NIC": (12.8654, -85.2072), "NER": (17.6078, 8.0817), "NGA": (9.0820, 8.6753),
+    "MKD": (41.5124, 21.7465), "NOR": (60.4720, 8.4689), "OMN": (21.4735, 55.9754),
+    "PAK": (30.3753, 69.3451), "PSE": (31.9522, 35.2332), "PAN": (8.5380, -80.7821),
+    "PNG": (-6.3150, 143.9555), "PRY": (-23.4425, -58.4438), "PER": (-9.1900, -75.0152),
+    "PHL": (12.8797, 121.7740), "POL": (51.9194, 19.1451), "PRT": (39.3999, -8.2245),
+    "QAT": (25.3548, 51.1839), "ROU": (45.9432, 24.9668), "RUS": (61.5240, 105.3188),
+    "RWA": (-1.9403, 29.8739), "SAU": (23.8859, 45.0792), "SEN": (14.4974, -14.4524),
+    "SRB": (44.0165, 21.0059), "SLE": (8.4606, -11.7799), "SGP": (1.3521, 103.8198),
+    "SVK": (48.6690, 19.6990), "SVN": (46.1512, 14.9955), "SOM": (5.1521, 46.1996),
+    "ZAF": (-30.5595, 22.9375), "SSD": (6.8770, 31.3070), "ESP": (40.4637, -3.7492),
+    "LKA": (7.8731, 80.7718), "SDN": (12.8628, 30.2176), "SUR": (3.9193, -56.0278),
+    "SWE": (60.1282, 18.6435), "CHE": (46.8182, 8.2275), "SYR": (34.8021, 38.9968),
+    "TJK": (38.8610, 71.2761), "TZA": (-6.3690, 34.8888), "THA": (15.8700, 100.9925),
+    "TLS": (-8.8742, 125.7275), "TGO": (8.6195, 0.8248), "TTO": (10.6918, -61.2225),
+    "TUN": (33.8869, 9.5375), "TUR": (38.9637, 35.2433), "TKM": (38.9697, 59.5563),
+    "UGA": (1.3733, 32.2903), "UKR": (48.3794, 31.1656), "ARE": (23.4241, 53.8478),
+    "GBR": (55.3781, -3.4360), "USA": (37.0902, -95.7129), "URY": (-32.5228, -55.7658),
+    "UZB": (41.3775, 64.5853), "VEN": (6.4238, -66.5897), "VNM": (14.0583, 108.2772),
+    "YEM": (15.5527, 48.5164), "ZMB": (-13.1339, 27.8493), "ZWE": (-19.0154, 29.1549),
+    "XKX": (42.6026, 20.9030), "TWN": (23.6978, 120.9605),
+    # Additional countries and territories
+    "PRK": (40.3399, 127.5101), "BRB": (13.1939, -59.5432), "ATG": (17.0608, -61.7964),
+    "BHS": (25.0343, -77.3963), "BHR": (26.0667, 50.5577), "BLZ": (17.1899, -88.4976),
+    "BRN": (4.5353, 114.7277), "CPV": (16.5388, -23.0418), "DMA": (15.4150, -61.3710),
+    "GRD": (12.1165, -61.6790), "KIR": (-3.3704, -168.7340), "LIE": (47.1660, 9.5554),
+    "MHL": (7.1315, 171.1845), "FSM": (7.4256, 150.5508), "MCO": (43.7384, 7.4246),
+    "NRU": (-0.5228, 166.9315), "PLW": (7.5150, 134.5825), "KNA": (17.3578, -62.7830),
+    "LCA": (13.9094, -60.9789), "VCT": (12.9843, -61.2872), "WSM": (-13.7590, -172.1046),
+    "SMR": (43.9424, 12.4578), "STP": (0.1864, 6.6131), "SYC": (-4.6796, 55.4920),
+    "SLB": (-9.6457, 160.1562), "TON": (-21.1790, -175.1982), "TUV": (-7.1095, 179.1940),
+    "VUT": (-15.3767, 166.9592), "AND": (42.5063, 1.5218),
+    # Territories
+    "ABW": (12.5211, -69.9683), "AIA": (18.2206, -63.0686), "ASM": (-14.2710, -170.1322),
+    "BES": (12.2019, -68.2624), "BMU": (32.3078, -64.7505), "COK": (-21.2367, -159.7777),
+    "CUW": (12.1696, -68.9900), "CYM": (19.3133, -81.2546), "ESH": (24.2155, -12.8858),
+    "GIB": (36.1408, -5.3536), "GLP": (16.2650, -61.5510), "GUM": (13.4443, 144.7937),
+    "HKG": (22.3193, 114.1694), "MAC": (22.1987, 113.5439), "MAF": (18.0731, -63.0822),
+    "MNP": (15.0979, 145.6739), "MSR": (16.7425, -62.1874), "MTQ": (14.6415, -61.0242),
+    "NCL": (-20.9043, 165.6180), "NFK": (-29.0408, 167.9547), "NIU": (-19.0544, -169.8672),
+    "PRI": (18.2208, -66.5901), "PYF": (-17.6797, -149.4068), "REU": (-21.1151, 55.5364),
+    "SHN": (-15.9650, -5.7089), "SPM": (46.8852, -56.3159), "SXM": (18.0425, -63.0548),
+    "TCA": (21.6940, -71.7979), "TKL": (-9.2002, -171.8484), "VAT": (41.9029, 12.4534),
+    "VGB": (18.4207, -64.6400),
+}
+
+class JsonObjectFile:
+    """Members of a JSON file holding one large object, parsed one at a time.
+
+    Only the current member's text is held in memory. members() yields (key, value, span),
+    where span is the value's byte range in the file, so read() can load it again later
+    without keeping it around. A missing file raises FileNotFoundError, unless it is
+    `optional`, in which case it has no members.
+    """
+    CHUNK = 1 << 16
+
+    def __init__(self, path: Path, optional: bool = False):
+        if not optional and not path.exists(): raise FileNotFoundError(f"No such file: '{path}'")
+        self.path = path
+
+    def items(self):
+        for key, value, _ in self.members():
+            yield key, value
+
+    def read(self, span: tuple[int, int]):
+        with open(self.path, "rb") as f:
+            f.seek(span[0])
+            return json.loads(f.read(span[1] - span[0]))
+
+    def members(self):
+        if not self.path.exists(): return
+        decoder, text = json.JSONDecoder(), codecs.getincrementaldecoder("utf-8")()
+        buf, pos, base, eof = "", 0, 0, False  # base: byte offset of buf[0]
+        with open(self.path, "rb") as f:
+            def more():
+                nonlocal buf, pos, base, eof
+                base += len(buf[:pos].encode())
+                buf, pos = buf[pos:], 0
+                # Read at least as much as is pending, so re-parsing a large value stays linear
+                data = f.read(max(self.CHUNK, len(buf)))
+                eof = not data
+                buf += text.decode(data, final=eof)
+
+            def peek() -> str:
+                nonlocal pos
+                while True:
+                    while pos < len(buf) and buf[pos].isspace(): pos += 1
+                    if pos < len(buf) or eof: return buf[pos:pos + 1]
+                    more()
+
+            def value():
+                while True:
+                    try:
+                        result, end = decoder.raw_decode(buf, pos)
+                        # A number at the end of the buffer may continue in the next chunk
+                        if end < len(buf) or eof: return result, end
+                    except json.JSONDecodeError:
+                        if eof: raise
+                    more()
+
+            if peek() != "{": raise ValueError(f"{self.path}: expected a JSON object")
+            pos += 1
+            first = True
+            while (c := peek()) != "}":
+                if not first:
+                    if c != ",": raise ValueError(f"{self.path}: expected ',' or '}}' after {key!r}")
+                    pos += 1
+                    peek()
+                first = False
+                key, pos = value()
+                if peek() != ":": raise ValueError(f"{self.path}: expected ':' after {key!r}")
+                pos += 1
+                peek()
+                start = base + len(buf[:pos].encode())
+                item, pos = value()
+                yield key, item, (start, base + len(buf[:pos].encode()))
+
+# Trend file encodings: "rows" lists one {year, metric...} object per year and series;
+# "sparse" stores the year axis once in meta and per metric only [year index, value]
+# pairs that differ from the series' fill value (0 or null)
+TRENDS_FORMATS = ["rows", "sparse"]
+
+def trends_path(directory: Path, name: str, fmt: str) -> Path:
+    return directory / (f"{name}.json" if fmt == "rows" else f"{name}-{fmt}.json")
+
+def encode_trends(output: dict, series_keys: list[str], metrics: list[str], fill) -> dict:
+    """Sparse encoding of a rows-format trends file; the `series_keys` sections hold name -> points,
+    one per meta year in order."""
+    encoded = {**output, "meta": {**output["meta"], "format": "sparse", "metrics": metrics, "fill": fill}}
+    for key in series_keys:
+        encoded[key] = {name: {m: pairs for m in metrics
+                               if (pairs := [[i, p[m]] for i, p in enumerate(points) if p[m] != fill])}
+                        for name, points in output[key].items()}
+    return encoded
+
+def decode_trends(data: dict, series_keys: list[str]) -> dict:
+    """Rows-format trends file from either encoding."""
+    meta = data["meta"]
+    if meta.get("format") != "sparse": return data
+    years, metrics, fill = meta["years"], meta["metrics"], meta["fill"]
+    decoded = {**data, "meta": {k: v for k, v in meta.items() if k not in ("format", "metrics", "fill")}}
+    for key in series_keys:
+        decoded[key] = {}
+        for name, series in data[key].items():
+            points = [{"year": y, **{m: fill for m in metrics}} for y in years]
+            for m, pairs in series.items():
+                for i, value in pairs: points[i][m] = value
+            decoded[key][name] = points
+    return decoded
+
+def parse_years(spec: str) -> list[int]:
+    """'2024', '2022,2024' or '2021-2024' -> sorted years (argparse type for --years)."""
+    years = set()
+    for part in spec.split(","):
+        start, _, end = part.strip().partition("-")
+        years.update(range(int(start), int(end or start) + 1))
+    return sorted(years)
+
+def select_years(years: list[int] | None, available: list[int], what: str) -> list[int]:
+    """The requested `years` among `available` (all of them by default), in order.
+    Years outside `available` raise instead of being silently skipped."""
+    if not years: return available
+    outside = sorted(set(years) - set(available))
+    if outside:
+        span = f"{available[0]}-{available[-1]}" if available else "none"
+        raise ValueError(f"No {what} for {', '.join(map(str, outside))} (available: {span}); "
+                         "refresh the fused data and the store first")
+    return [y for y in available if y in years]
+
+def replace_years(path: Path, df: pd.DataFrame, years: list[int], col: str = "year") -> pd.DataFrame:
+    """Existing year-partitioned CSV at `path` with the rows for `years` replaced by `df`."""
+    import pandas as pd
+    if not path.exists(): return df
+    previous = pd.read_csv(path, float_precision="round_trip")
+    previous = previous[~previous[col].isin(years)]
+    return pd.concat([previous, df], ignore_index=True).sort_values(col, kind="stable", ignore_index=True)
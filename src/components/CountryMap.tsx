@@ -11,16 +11,8 @@ import { Switch } from "@/components/ui/switch";
 import { formatBudget } from "@/lib/entities";
 import { useYearRanges, generateYearRange } from "@/lib/useYearRanges";
 import { getSortedRegions } from "@/lib/regionGroupings";
-
-interface CountryExpense {
-  iso3: string;
-  name: string;
-  region: string;
-  lat: number;
-  long: number;
-  total: number;
-  entities: Record<string, number>;
-}
+import { loadCountryExpenses } from "@/lib/data";
+import { CountryExpense } from "@/types";
 
 interface HybridMapDataPoint {
   id: string;
@@ -33,11 +25,10 @@ interface HybridMapDataPoint {
     name: string;
     total: number;
     entities: Record<string, number>;
+    other_entities?: { count: number; total: number };
   };
 }
 
-const basePath = process.env.NEXT_PUBLIC_BASE_PATH || "";
-
 export function CountryMap() {
   const yearRanges = useYearRanges();
   const COUNTRY_YEARS = generateYearRange(yearRanges.countryExpenses.min, yearRanges.countryExpenses.max);
@@ -48,6 +39,7 @@ export function CountryMap() {
     name: string;
     total: number;
     entities: Record<string, number>;
+    other_entities?: { count: number; total: number };
   } | null>(null);
   const [loading, setLoading] = useState(true);
   const [showMap, setShowMap] = useState(true);
@@ -69,6 +61,7 @@ export function CountryMap() {
           name: country.name,
           total: country.total,
           entities: country.entities,
+          other_entities: country.other_entities,
         });
       }
       setPendingDeepLink(null);
@@ -76,9 +69,8 @@ export function CountryMap() {
   }, [loading, pendingDeepLink, countryData, setPendingDeepLink]);
 
   useEffect(() => {
-    fetch(`${basePath}/data/country-expenses-${selectedYear}.json`)
-      .then((res) => res.json())
-      .then((data: CountryExpense[]) => {
+    loadCountryExpenses(selectedYear)
+      .then((data) => {
         setCountryData(data);
         setLoading(false);
       })
@@ -132,6 +124,7 @@ export function CountryMap() {
       name: country.name,
       total: country.total,
       entities: country.entities,
+      other_entities: country.other_entities,
     },
   }));
 
@@ -142,6 +135,7 @@ export function CountryMap() {
         name: d.data.name,
         total: d.data.total,
         entities: d.data.entities,
+        other_entities: d.data.other_entities,
       });
       replaceToSidebar("country", d.data.iso3);
     }
@@ -153,6 +147,7 @@ export function CountryMap() {
       name: country.name,
       total: country.total,
       entities: country.entities,
+      other_entities: country.other_entities,
     });
     replaceToSidebar("country", country.iso3);
   };
@@ -8,7 +8,7 @@ import { useFocusTrap } from "@/hooks/useFocusTrap";
 import { navigateToSidebar } from "@/hooks/useDeepLink";
 import { YearSelector } from "@/components/ui/year-selector";
 import { useYearRanges, generateYearRange } from "@/lib/useYearRanges";
-import { loadUninfoCountry, UninfoCountryFull } from "@/lib/data";
+import { loadCountryExpenses, loadCountryExpensesEntities, loadUninfoCountry, UninfoCountryFull } from "@/lib/data";
 import { UninfoFundingBar } from "@/components/UninfoFundingBar";
 import { UninfoProjectTable } from "@/components/UninfoProjectTable";
 import { ResultsFramework } from "@/components/ResultsFramework";
@@ -25,13 +25,12 @@ const UNINFO_SORT_OPTIONS: SortOption[] = [
   { value: "spending_gap", label: "Spending Gap" },
 ];
 
-const basePath = process.env.NEXT_PUBLIC_BASE_PATH || "";
-
 interface CountryData {
   iso3: string;
   name: string;
   total: number;
   entities: Record<string, number>;
+  other_entities?: { count: number; total: number };
 }
 
 interface CountrySidebarProps {
@@ -55,6 +54,7 @@ export function CountrySidebar({ country, initialYear, onClose }: CountrySidebar
   const [isVisible, setIsVisible] = useState(false);
   const [isClosing, setIsClosing] = useState(false);
   const [showAllEntities, setShowAllEntities] = useState(false);
+  const [fullEntities, setFullEntities] = useState<Record<string, number> | null>(null);
   const [touchStart, setTouchStart] = useState<number | null>(null);
   const [touchEnd, setTouchEnd] = useState<number | null>(null);
   
@@ -81,18 +81,19 @@ export function CountrySidebar({ country, initialYear, onClose }: CountrySidebar
 
   // Fetch country data when year changes
   useEffect(() => {
+    setShowAllEntities(false);
+    setFullEntities(null);
     if (selectedYear === initialYear) {
       setYearCountry(country);
       return;
     }
     setLoadingYear(true);
-    fetch(`${basePath}/data/country-expenses-${selectedYear}.json`)
-      .then(res => res.json())
-      .then((data: CountryData[]) => {
+    loadCountryExpenses(selectedYear)
+      .then((data) => {
         const found = data.find(c => c.iso3 === country.iso3);
-        setYearCountry(found || { ...country, total: 0, entities: {} });
+        setYearCountry(found || { ...country, total: 0, entities: {}, other_entities: undefined });
       })
-      .catch(() => setYearCountry({ ...country, total: 0, entities: {} }))
+      .catch(() => setYearCountry({ ...country, total: 0, entities: {}, other_entities: undefined }))
       .finally(() => setLoadingYear(false));
   }, [selectedYear, country, initialYear]);
 
@@ -137,16 +138,27 @@ export function CountrySidebar({ country, initialYear, onClose }: CountrySidebar
     if (e.target === e.currentTarget) handleClose();
   };
 
-  // Sort entities by amount descending (use year-specific data)
-  const sortedEntities = Object.entries(yearCountry.entities).sort(
+  // Sort entities by amount descending (use year-specific data; entities may be
+  // truncated, with the rest in other_entities)
+  const sortedEntities = Object.entries(fullEntities || yearCountry.entities).sort(
     (a, b) => b[1] - a[1]
   );
+  const otherEntities = fullEntities ? undefined : yearCountry.other_entities;
+  const entityCount = sortedEntities.length + (otherEntities?.count || 0);
   const displayedEntities = showAllEntities
     ? sortedEntities
     : sortedEntities.slice(0, 10);
   const maxEntityTotal =
     sortedEntities.length > 0 ? sortedEntities[0][1] : 0;
 
+  const showAllEntityRows = () => {
+    setShowAllEntities(true);
+    if (!otherEntities) return;
+    loadCountryExpensesEntities(selectedYear)
+      .then((maps) => setFullEntities(maps[country.iso3] || null))
+      .catch(() => setFullEntities(null));
+  };
+
   const sidebarTitleId = `country-sidebar-title`;
 
   return (
@@ -212,7 +224,7 @@ export function CountrySidebar({ country, initialYear, onClose }: CountrySidebar
                   Entities Active
                 </span>
                 <div className="mt-0.5 text-lg font-semibold text-gray-700">
-                  {sortedEntities.length}
+                  {entityCount}
                 </div>
               </div>
             </div>
@@ -251,12 +263,29 @@ export function CountrySidebar({ country, initialYear, onClose }: CountrySidebar
                 );
               })}
 
-              {!showAllEntities && sortedEntities.length > 10 && (
+              {otherEntities && (showAllEntities || sortedEntities.length <= 10) && (
+                <div className="flex items-center gap-2">
+                  <span className="w-20 flex-shrink-0 truncate text-xs font-medium text-gray-500">
+                    {otherEntities.count} other entities
+                  </span>
+                  <div className="flex flex-1 flex-col gap-px">
+                    <div
+                      className="h-2 rounded-sm bg-gray-300 transition-all"
+                      style={{ width: `${Math.min((otherEntities.total / maxEntityTotal) * 100, 100)}%` }}
+                    />
+                  </div>
+                  <div className="w-20 flex-shrink-0 text-right text-xs text-gray-500">
+                    {formatBudgetFixed(otherEntities.total)}
+                  </div>
+                </div>
+              )}
+
+              {!showAllEntities && (sortedEntities.length > 10 || otherEntities) && (
                 <button
-                  onClick={() => setShowAllEntities(true)}
+                  onClick={showAllEntityRows}
                   className="mt-2 text-xs text-gray-600 underline hover:text-gray-900"
                 >
-                  Show all {sortedEntities.length} entities
+                  Show all {entityCount} entities
                 </button>
               )}
             </div>
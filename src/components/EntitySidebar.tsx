@@ -3,13 +3,14 @@
 import { ExternalLink, X } from "lucide-react";
 import { ShareButton } from "@/components/ShareButton";
 import { useCallback, useEffect, useState } from "react";
-import { Entity, Impact, EntityRevenue, CountryExpense, EntitySpendingBreakdown } from "@/types";
+import { Entity, Impact, EntityRevenue, CountryExpense, DonorContribution, EntitySpendingBreakdown } from "@/types";
 import { getSystemGroupingStyle } from "@/lib/systemGroupings";
 import { formatBudget } from "@/lib/entities";
 import { getContributionTypeBgColor, getContributionTypeOrder } from "@/lib/contributors";
 import { FinancingInstrumentLabel } from "@/components/FinancingInstrumentLabel";
 import { getFinancingInstrumentColor } from "@/lib/financingInstruments";
 import { useFocusTrap } from "@/hooks/useFocusTrap";
+import { loadCountryExpenses, loadCountryExpensesEntities, loadEntityRevenueDonors } from "@/lib/data";
 import { navigateToSidebar } from "@/hooks/useDeepLink";
 import { YearSelector } from "@/components/ui/year-selector";
 import { useYearRanges, generateYearRange } from "@/lib/useYearRanges";
@@ -50,6 +51,7 @@ export function EntitySidebar({ entity, spending, revenue, initialYear, onClose
   const [impacts, setImpacts] = useState<Impact[]>([]);
   const [loadingImpacts, setLoadingImpacts] = useState(true);
   const [showAllDonors, setShowAllDonors] = useState(false);
+  const [fullDonors, setFullDonors] = useState<DonorContribution[] | null>(null);
   const [showAllCountries, setShowAllCountries] = useState(false);
   const [touchStart, setTouchStart] = useState<number | null>(null);
   const [touchEnd, setTouchEnd] = useState<number | null>(null);
@@ -133,6 +135,12 @@ export function EntitySidebar({ entity, spending, revenue, initialYear, onClose
     }).finally(() => setLoadingYear(false));
   }, [selectedYear, entity?.entity, initialYear, spending, revenue]);
 
+  // Full donor lists are per year and entity
+  useEffect(() => {
+    setShowAllDonors(false);
+    setFullDonors(null);
+  }, [selectedYear, entity?.entity]);
+
   useEffect(() => {
     const timer = setTimeout(() => setIsVisible(true), 10);
     return () => clearTimeout(timer);
@@ -171,16 +179,19 @@ export function EntitySidebar({ entity, spending, revenue, initialYear, onClose
 
     setLoadingSpending(true);
     Promise.all([
-      fetch(`${basePath}/data/country-expenses-${selectedYear}.json`)
-        .then(r => r.json())
-        .catch(() => []),
+      loadCountryExpenses(selectedYear).catch(() => []),
       fetch(`${basePath}/data/sdg-expenses-${selectedYear}.json`)
         .then(r => r.json())
         .catch(() => ({})),
-    ]).then(([countryData, sdgData]: [CountryExpense[], Record<string, { total: number; entities: Record<string, number> }>]) => {
+    ]).then(async ([countryData, sdgData]: [CountryExpense[], Record<string, { total: number; entities: Record<string, number> }>]) => {
+      // Countries truncated with --top-k keep their full entity maps in a detail file
+      const fullMaps: Record<string, Record<string, number>> = countryData.some(country => country.other_entities)
+        ? await loadCountryExpensesEntities(selectedYear).catch(() => ({}))
+        : {};
       const byCountry = countryData
-        .filter(country => country.entities[entity.entity])
-        .map(country => ({ name: country.name, iso3: country.iso3, amount: country.entities[entity.entity] }))
+        .map(country => ({ country, entities: fullMaps[country.iso3] || country.entities }))
+        .filter(({ entities }) => entities[entity.entity])
+        .map(({ country, entities }) => ({ name: country.name, iso3: country.iso3, amount: entities[entity.entity] }))
         .sort((a, b) => b.amount - a.amount);
 
       const bySDG = Object.entries(sdgData)
@@ -240,8 +251,10 @@ export function EntitySidebar({ entity, spending, revenue, initialYear, onClose
       )
     : [];
 
-  // Process revenue breakdown by donor
-  const donorContributions = yearRevenue?.by_donor || [];
+  // Process revenue breakdown by donor (by_donor may be truncated, with the rest in other_donors)
+  const donorContributions = fullDonors || yearRevenue?.by_donor || [];
+  const otherDonors = fullDonors ? undefined : yearRevenue?.other_donors;
+  const donorCount = donorContributions.length + (otherDonors?.count || 0);
   const displayedDonors = showAllDonors
     ? donorContributions
     : donorContributions.slice(0, 10);
@@ -249,6 +262,14 @@ export function EntitySidebar({ entity, spending, revenue, initialYear, onClose
     ? Math.max(...donorContributions.map((d) => d.total))
     : 0;
 
+  const showAllDonorRows = () => {
+    setShowAllDonors(true);
+    if (!otherDonors || !entity?.entity) return;
+    loadEntityRevenueDonors(selectedYear)
+      .then((lists) => setFullDonors(lists[entity.entity] || null))
+      .catch(() => setFullDonors(null));
+  };
+
   const sidebarTitleId = `entity-sidebar-title`;
 
   return (
@@ -506,12 +527,29 @@ export function EntitySidebar({ entity, spending, revenue, initialYear, onClose
                     );
                   })}
 
-                  {!showAllDonors && donorContributions.length > 10 && (
+                  {otherDonors && (showAllDonors || donorContributions.length <= 10) && (
+                    <div className="flex items-center gap-2">
+                      <span className="w-24 flex-shrink-0 truncate text-xs font-medium text-gray-500">
+                        {otherDonors.count} other donors
+                      </span>
+                      <div className="flex flex-1 flex-col gap-px">
+                        <div
+                          className="h-2 rounded-sm bg-gray-300"
+                          style={{ width: `${Math.min((otherDonors.total / maxDonorTotal) * 100, 100)}%` }}
+                        />
+                      </div>
+                      <div className="w-16 flex-shrink-0 text-right text-xs text-gray-500">
+                        {formatBudgetFixed(otherDonors.total)}
+                      </div>
+                    </div>
+                  )}
+
+                  {!showAllDonors && (donorContributions.length > 10 || otherDonors) && (
                     <button
-                      onClick={() => setShowAllDonors(true)}
+                      onClick={showAllDonorRows}
                       className="mt-2 text-xs text-gray-600 underline hover:text-gray-900"
                     >
-                      Show all {donorContributions.length} donors
+                      Show all {donorCount} donors
                     </button>
                   )}
                 </div>
@@ -3,13 +3,13 @@
 import { X } from "lucide-react";
 import { useCallback, useEffect, useState } from "react";
 import { formatBudget } from "@/lib/entities";
-import { SDG } from "@/lib/sdgs";
+import { SDG, SDGExpensesDetail } from "@/lib/sdgs";
 import { ShareButton } from "@/components/ShareButton";
 import { useFocusTrap } from "@/hooks/useFocusTrap";
 import { navigateToSidebar } from "@/hooks/useDeepLink";
 import { YearSelector } from "@/components/ui/year-selector";
 import { useYearRanges, generateYearRange } from "@/lib/useYearRanges";
-import { loadUninfoSdgs, loadUninfoCountryIndex, UninfoSdgData } from "@/lib/data";
+import { loadSdgExpensesDetail, loadUninfoSdgs, loadUninfoCountryIndex, UninfoSdgData } from "@/lib/data";
 import { UninfoFundingBar } from "@/components/UninfoFundingBar";
 import { Tooltip, TooltipContent, TooltipTrigger } from "@/components/ui/tooltip";
 import { SortSelector, SortOption } from "@/components/ui/sort-selector";
@@ -55,6 +55,7 @@ export default function SDGModal({
   const [selectedYear, setSelectedYear] = useState(initialYear);
   const [yearEntityExpenses, setYearEntityExpenses] = useState<{ [entity: string]: number } | undefined>(entityExpenses);
   const [loadingYear, setLoadingYear] = useState(false);
+  const [detail, setDetail] = useState<SDGExpensesDetail | null>(null);
   
   // UNINFO Cooperation Framework data
   const [uninfoData, setUninfoData] = useState<UninfoSdgData | null>(null);
@@ -94,6 +95,13 @@ export default function SDGModal({
       .finally(() => setLoadingYear(false));
   }, [selectedYear, sdg, initialYear, entityExpenses]);
 
+  // Fetch target and indicator spending for this goal only
+  useEffect(() => {
+    if (!sdg) return;
+    setDetail(null);
+    loadSdgExpensesDetail(selectedYear, sdg.number).then(setDetail);
+  }, [selectedYear, sdg]);
+
   useEffect(() => {
     const timer = setTimeout(() => setIsVisible(true), 10);
     return () => clearTimeout(timer);
@@ -389,9 +397,16 @@ export default function SDGModal({
             <div className="space-y-4">
               {sdg.targets.map((target) => (
                 <div key={target.number}>
-                  <h4 className="mb-2 text-base font-normal uppercase tracking-wider text-gray-900 sm:text-lg">
-                    Target {target.number}
-                  </h4>
+                  <div className="mb-2 flex items-baseline justify-between gap-2">
+                    <h4 className="text-base font-normal uppercase tracking-wider text-gray-900 sm:text-lg">
+                      Target {target.number}
+                    </h4>
+                    {detail?.targets[target.number] && (
+                      <span className="text-xs font-semibold text-gray-700">
+                        {formatBudget(detail.targets[target.number].total)} spent in {selectedYear}
+                      </span>
+                    )}
+                  </div>
                   <p className="mb-3 text-xs leading-relaxed text-gray-700 sm:text-sm">
                     {target.description}
                   </p>
@@ -408,6 +423,11 @@ export default function SDGModal({
                           <span className="leading-relaxed text-gray-700">
                             {indicator.description}
                           </span>
+                          {detail?.indicators[indicator.number] && (
+                            <span className="ml-auto whitespace-nowrap text-xs text-gray-500">
+                              {formatBudget(detail.indicators[indicator.number].total)}
+                            </span>
+                          )}
                         </div>
                       ))}
                     </div>
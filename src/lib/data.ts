@@ -1,3 +1,6 @@
+import { CountryExpense, DonorContribution } from "@/types";
+import { SDGExpensesDetail } from "@/lib/sdgs";
+
 const basePath = process.env.NEXT_PUBLIC_BASE_PATH || "";
 
 export async function loadYearData<T>(dataset: string, year: number): Promise<T> {
@@ -95,3 +98,69 @@ export async function loadUninfoSdgs(): Promise<Record<string, UninfoSdgData>> {
   uninfoSdgsCache = await loadStaticData<Record<string, UninfoSdgData>>("uninfo-sdgs.json");
   return uninfoSdgsCache;
 }
+
+// Country expenses: per-year amounts (country-expenses-{year}.json) joined with the
+// names, regions and coordinates shared across years (country-centroids.json)
+export interface CountryCentroids {
+  scale: number; // lat/long are integers in units of 1/scale degrees
+  countries: Record<string, { name: string; region: string; lat: number; long: number }>;
+}
+
+type CountryExpenseAmounts = Pick<CountryExpense, "iso3" | "total" | "entities" | "other_entities">;
+
+let countryCentroidsCache: CountryCentroids | null = null;
+
+export async function loadCountryCentroids(): Promise<CountryCentroids> {
+  if (countryCentroidsCache) return countryCentroidsCache;
+  countryCentroidsCache = await loadStaticData<CountryCentroids>("country-centroids.json");
+  return countryCentroidsCache;
+}
+
+export async function loadCountryExpenses(year: number): Promise<CountryExpense[]> {
+  const [centroids, rows] = await Promise.all([
+    loadCountryCentroids(),
+    loadYearData<CountryExpenseAmounts[]>("country-expenses", year),
+  ]);
+  return rows.flatMap((row) => {
+    const country = centroids.countries[row.iso3];
+    if (!country) return [];
+    return [{
+      ...row,
+      name: country.name,
+      region: country.region,
+      lat: country.lat / centroids.scale,
+      long: country.long / centroids.scale,
+    }];
+  });
+}
+
+// Detail files written by --top-k: the full lists behind by_donor / entities for the
+// rows that were truncated inline (missing when the export was not truncated)
+const entityRevenueDonorsCache: Record<number, Record<string, DonorContribution[]>> = {};
+const countryExpensesEntitiesCache: Record<number, Record<string, Record<string, number>>> = {};
+
+export async function loadEntityRevenueDonors(year: number): Promise<Record<string, DonorContribution[]>> {
+  if (entityRevenueDonorsCache[year]) return entityRevenueDonorsCache[year];
+  entityRevenueDonorsCache[year] = await loadYearData<Record<string, DonorContribution[]>>("entity-revenue-donors", year);
+  return entityRevenueDonorsCache[year];
+}
+
+export async function loadCountryExpensesEntities(year: number): Promise<Record<string, Record<string, number>>> {
+  if (countryExpensesEntitiesCache[year]) return countryExpensesEntitiesCache[year];
+  countryExpensesEntitiesCache[year] = await loadYearData<Record<string, Record<string, number>>>("country-expenses-entities", year);
+  return countryExpensesEntitiesCache[year];
+}
+
+// SDG target / indicator spending, one shard per year and goal (null for goals without detail)
+const sdgExpensesDetailCache: Record<string, SDGExpensesDetail | null> = {};
+
+export async function loadSdgExpensesDetail(year: number, goal: number): Promise<SDGExpensesDetail | null> {
+  const key = `${year}-${goal}`;
+  if (key in sdgExpensesDetailCache) return sdgExpensesDetailCache[key];
+  try {
+    sdgExpensesDetailCache[key] = await loadStaticData<SDGExpensesDetail>(`sdg-expenses-detail/${key}.json`);
+  } catch {
+    sdgExpensesDetailCache[key] = null;
+  }
+  return sdgExpensesDetailCache[key];
+}
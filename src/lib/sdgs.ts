@@ -25,6 +25,12 @@ export interface SDGExpensesData {
   };
 }
 
+// Per year and goal, sdg-expenses-detail/{year}-{goal}.json (keyed by target / indicator number)
+export interface SDGExpensesDetail {
+  targets: SDGExpensesData;
+  indicators: SDGExpensesData;
+}
+
 // SDG Colors (official UN SDG colors)
 export const SDG_COLORS: Record<number, string> = {
   1: "#E5243B",
@@ -63,8 +63,12 @@ export interface EntityRevenue {
   year: number;
   by_type: Record<string, number>;
   by_donor: DonorContribution[];
+  // Donors cut from by_donor by --top-k; their full list is in entity-revenue-donors-{year}.json
+  other_donors?: DonorRemainder;
 }
 
+export type DonorRemainder = Omit<DonorContribution, "donor"> & { count: number };
+
 export interface CountryExpense {
   iso3: string;
   name: string;
@@ -73,6 +77,8 @@ export interface CountryExpense {
   long: number;
   total: number;
   entities: Record<string, number>;
+  // Entities cut from entities by --top-k; the full map is in country-expenses-entities-{year}.json
+  other_entities?: { count: number; total: number };
 }
 
 export interface EntitySpendingBreakdown {